@@ -3,72 +3,155 @@ import re
 from datetime import datetime
 from typing import Dict, Any, List
 
+# 预编译正则，避免每次调用时重复查找 re 模块缓存
+# 清理文本时每段连续空白只匹配一次，由 _clean_dispatch 根据两侧字符决定替换内容
+_RE_WS_RUN = re.compile(r'\s+')
+# 两侧不保留空白的字符：括号与中文标点
+_NO_SPACE_NEIGHBOURS = frozenset('()[]。，；：！？')
+# 中文标点后统一补一个空格，用 str.translate 在 C 层完成，无需逐个匹配回调
+_CJK_PUNCT_SPACING = str.maketrans({punct: punct + ' ' for punct in '。，；：！？'})
+# f-string 表达式中不能直接写反斜杠，拼接 Markdown 时使用该常量
+_NL = '\n'
+# 清理后文本超过该长度时，Markdown 导出中只保留前 _EXPORT_TRUNCATE_LENGTH 个字符
+_MAX_EXPORT_LENGTH = 2_000_000
+_EXPORT_TRUNCATE_LENGTH = 1_000_000
+
+
+def _clean_dispatch(m: re.Match) -> str:
+    """根据空白两侧的字符决定保留一个空格还是直接删除"""
+    text = m.string
+    start, end = m.span()
+    if start == 0 or end == len(text):
+        return ''
+    prev, nxt = text[start - 1], text[end]
+    # 括号和中文标点两侧不留空白
+    if prev in _NO_SPACE_NEIGHBOURS or nxt in _NO_SPACE_NEIGHBOURS:
+        return ''
+    # 中文字符之间、被分割的英文单词、被分割的数字
+    if '\u4e00' <= prev <= '\u9fff' and '\u4e00' <= nxt <= '\u9fff':
+        return ''
+    if prev.isascii() and prev.isalpha() and nxt.isascii() and nxt.isalpha():
+        return ''
+    if prev.isdecimal() and nxt.isdecimal():
+        return ''
+    return ' '
+
+try:
+    # google-re2 为线性时间匹配引擎，不会出现回溯爆炸；未安装时退回标准库
+    import re2 as _re_engine
+except ImportError:
+    _re_engine = re
+
+# 章节提取：先定位章节起点，再从起点之后查找终点，代替 [\s\S]*? 加前瞻的写法
+# 终点为 None 时表示章节内容取起点模式的第 2 个分组
+_SECTION_PATTERNS = [
+    (_re_engine.compile(r'(?i)(摘要|Abstract)'),
+     _re_engine.compile(r'(?i)关键词|Key\s*words|１|1\s*引言|Introduction')),
+    (re.compile(r'(关键词|Key\s*words)[：:\s]*([^\n]*)', re.IGNORECASE), None),
+    (_re_engine.compile(r'(?i)(引言|Introduction)'),
+     _re_engine.compile(r'(?i)２|2\s*|方法|Method')),
+    (_re_engine.compile(r'(?i)(结论|Conclusion|结束语)'),
+     _re_engine.compile(r'(?i)参考文献|References|$')),
+]
+
+_RE_ABSTRACT_END = _re_engine.compile(r'关键词|Key')
+_RE_KEYWORDS = re.compile(r'关键词[：:\s]*([^\n]*)')
+# 编号列表：编号标记（含其后的空白），以及会截断列表项内容的字符
+_RE_NUMBERED_MARKER = re.compile(r'[１-９1-9]\s*[）)]\s*')
+_RE_NUMBERED_STOP = re.compile(r'[１-９1-9）)]')
+
+
+def _find_numbered_items(text: str, limit: int) -> List[str]:
+    """线性扫描编号列表项（如 "1) xxx"、"２）xxx"），返回前 limit 项的内容
+
+    每项内容从编号之后开始，到下一个编号或文本末尾为止；
+    若中途遇到不构成编号的数字或右括号，该项不计入结果。
+    """
+    items = []
+    n = len(text)
+    markers = _RE_NUMBERED_MARKER.finditer(text)
+    marker = next(markers, None)
+    while marker is not None and len(items) < limit:
+        next_marker = next(markers, None)
+        start = marker.end()
+        stop = _RE_NUMBERED_STOP.search(text, start)
+        stop_pos = stop.start() if stop else n
+        if text.endswith('\n') and start <= n - 1 < stop_pos:
+            # 与正则 $ 一致：文本以换行结尾时，末尾换行之前即视为结尾
+            items.append(text[start:n - 1])
+        elif stop is None:
+            items.append(text[start:])
+        elif next_marker is not None and next_marker.start() == stop_pos:
+            items.append(text[start:stop_pos])
+        marker = next_marker
+    return items
+
+# 文档类型检测：各类关键词合并为一个正则，一次扫描全文
+_RE_DOCTYPE = re.compile(
+    r'(?P<paper>摘要|Abstract|关键词|Key\s*words)'
+    r'|(?P<book>第[一二三四五六七八九十]章|Chapter)'
+    r'|(?P<legal>条款|协议|合同)'
+)
+
 async def main(args: Args) -> Output:
     params = args.params
     
     # 获取输入参数 - 现在只需要一个大字符串
     raw_content = params.get('raw_content', '')
+    # 可选参数：需要生成的导出格式（json / markdown / plain_text），未提供时全部生成
+    requested_exports = params.get('export_formats') or ['json', 'markdown', 'plain_text']
+    # 允许传入单个格式名字符串；统一转为集合，避免对字符串做子串匹配
+    if isinstance(requested_exports, str):
+        requested_exports = {requested_exports}
+    else:
+        requested_exports = set(requested_exports)
+    
+    # 处理时间只取一次，报告与导出内容共用同一个时间戳
+    processed_at = datetime.now().isoformat()
     
     def clean_and_format_text(text: str) -> str:
         """清理和格式化混乱的PDF文本"""
         if not text:
             return ""
         
-        # 移除多余的换行符和空格
-        text = re.sub(r'\n+', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # 处理中文字符间的空格问题
-        text = re.sub(r'(?<=[\u4e00-\u9fff])\s+(?=[\u4e00-\u9fff])', '', text)
-        
-        # 处理英文单词被分割的问题
-        text = re.sub(r'(?<=[a-zA-Z])\s+(?=[a-zA-Z])', '', text)
+        # 合并空白、处理中英文/数字间的断开、去掉括号与中文标点两侧的空白
+        text = _RE_WS_RUN.sub(_clean_dispatch, text)
         
-        # 处理数字和符号
-        text = re.sub(r'(?<=\d)\s+(?=\d)', '', text)
-        text = re.sub(r'(?<=[.,;:!?])\s+(?=[\u4e00-\u9fff])', ' ', text)
-        
-        # 处理特殊符号
-        text = re.sub(r'\s*\(\s*', '(', text)
-        text = re.sub(r'\s*\)\s*', ')', text)
-        text = re.sub(r'\s*\[\s*', '[', text)
-        text = re.sub(r'\s*\]\s*', ']', text)
-        
-        # 处理标点符号
-        text = re.sub(r'\s*[。，；：！？]\s*', lambda m: m.group().strip() + ' ', text)
-        
-        return text.strip()
+        # 中文标点后补一个空格；末尾标点后补出的空格需去掉
+        return text.translate(_CJK_PUNCT_SPACING).rstrip()
     
     def extract_key_sections(text: str) -> Dict[str, str]:
         """提取关键章节"""
         sections = {}
         
         # 查找标题模式
-        title_patterns = [
-            r'(摘要|Abstract)[\s\S]*?(?=关键词|Key\s*words|１|1\s*引言|Introduction)',
-            r'(关键词|Key\s*words)[：:\s]*([^\n]*)',
-            r'(引言|Introduction)[\s\S]*?(?=２|2\s*|方法|Method)',
-            r'(结论|Conclusion|结束语)[\s\S]*?(?=参考文献|References|$)',
-        ]
-        
-        for pattern in title_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                section_name = match.group(1)
-                section_content = match.group(0) if len(match.groups()) == 1 else match.group(2)
-                sections[section_name] = clean_and_format_text(section_content)
+        for start_pattern, end_pattern in _SECTION_PATTERNS:
+            match = start_pattern.search(text)
+            if not match:
+                continue
+            section_name = match.group(1)
+            if end_pattern is None:
+                section_content = match.group(2)
+            else:
+                end_match = end_pattern.search(text, match.end())
+                if not end_match:
+                    continue
+                section_content = text[match.start():end_match.start()]
+            # 传入的已是清理后的文本，截取片段只需去掉首尾空白
+            sections[section_name] = section_content.strip()
         
         return sections
     
-    def generate_summary(text: str) -> str:
+    def generate_summary(text: str, cleaned_text: str) -> str:
         """生成文档摘要"""
         # 寻找摘要部分
-        abstract_match = re.search(r'摘要[\s\S]*?(?=关键词|Key)', text)
-        if abstract_match:
-            return clean_and_format_text(abstract_match.group(0))
+        abstract_start = text.find('摘要')
+        if abstract_start != -1:
+            abstract_end = _RE_ABSTRACT_END.search(text, abstract_start + 2)
+            if abstract_end:
+                return clean_and_format_text(text[abstract_start:abstract_end.start()])
         
-        # 如果没有找到摘要，取前1000个字符
-        cleaned_text = clean_and_format_text(text)
+        # 如果没有找到摘要，取清理后文本的前1000个字符
         return cleaned_text[:1000] + "..." if len(cleaned_text) > 1000 else cleaned_text
     
     def extract_key_points(text: str) -> List[str]:
@@ -76,14 +159,13 @@ async def main(args: Args) -> Output:
         key_points = []
         
         # 查找关键词
-        keywords_match = re.search(r'关键词[：:\s]*([^\n]*)', text)
+        keywords_match = _RE_KEYWORDS.search(text)
         if keywords_match:
             keywords = keywords_match.group(1).split('；')
             key_points.extend([kw.strip() for kw in keywords if kw.strip()])
         
         # 查找编号列表
-        numbered_items = re.findall(r'[１-９1-9]\s*[）)]\s*([^１-９1-9）)]*?)(?=[１-９1-9]\s*[）)]|$)', text)
-        for item in numbered_items[:5]:  # 最多5个
+        for item in _find_numbered_items(text, 5):  # 最多5个
             cleaned_item = clean_and_format_text(item)
             if len(cleaned_item) > 10 and len(cleaned_item) < 200:
                 key_points.append(cleaned_item)
@@ -92,11 +174,16 @@ async def main(args: Args) -> Output:
     
     def detect_document_type(text: str) -> str:
         """检测文档类型"""
-        if re.search(r'摘要|Abstract|关键词|Key\s*words', text):
-            return "学术论文"
-        elif re.search(r'第[一二三四五六七八九十]章|Chapter', text):
+        # 优先级：学术论文 > 书籍/报告 > 法律文档，命中论文关键词即可提前返回
+        found = set()
+        for match in _RE_DOCTYPE.finditer(text):
+            if match.lastgroup == "paper":
+                return "学术论文"
+            found.add(match.lastgroup)
+        
+        if "book" in found:
             return "书籍/报告"
-        elif re.search(r'条款|协议|合同', text):
+        elif "legal" in found:
             return "法律文档"
         else:
             return "普通文档"
@@ -128,7 +215,7 @@ async def main(args: Args) -> Output:
                 "statistics": {"original_length": 0, "cleaned_length": 0}
             },
             "processing_report": {
-                "processed_at": datetime.now().isoformat(),
+                "processed_at": processed_at,
                 "processing_status": "failed",
                 "error_message": "输入内容为空"
             },
@@ -143,18 +230,65 @@ async def main(args: Args) -> Output:
     structured_content = create_structured_content(raw_content)
     
     # 生成摘要和关键点
-    summary = generate_summary(raw_content)
+    summary = generate_summary(raw_content, structured_content["full_content"])
     key_points = extract_key_points(raw_content)
     
     # 生成统计信息
+    original_length = structured_content["original_length"]
+    cleaned_length = structured_content["cleaned_length"]
     stats = {
-        "original_length": structured_content["original_length"],
-        "cleaned_length": structured_content["cleaned_length"],
-        "compression_ratio": round(structured_content["cleaned_length"] / structured_content["original_length"] * 100, 2) if structured_content["original_length"] > 0 else 0,
+        "original_length": original_length,
+        "cleaned_length": cleaned_length,
+        "compression_ratio": round(cleaned_length / original_length * 100, 2) if original_length > 0 else 0,
         "sections_found": len(structured_content["sections"]),
         "key_points_extracted": len(key_points)
     }
     
+    def build_json_export() -> str:
+        """生成 JSON 导出内容（供程序读取，使用紧凑格式）"""
+        return json.dumps({
+            "content": structured_content["full_content"],
+            "summary": summary,
+            "key_points": key_points,
+            "document_type": structured_content["document_type"],
+            "processed_at": processed_at
+        }, ensure_ascii=False, separators=(',', ':'))
+    
+    def build_markdown_export() -> str:
+        """生成 Markdown 导出内容"""
+        full_content = structured_content['full_content']
+        if cleaned_length > _MAX_EXPORT_LENGTH:
+            # 超长文档不在 Markdown 中再完整复制一遍，完整文本见 plain_text
+            full_content = full_content[:_EXPORT_TRUNCATE_LENGTH] + "\n\n...(内容过长已截断，完整内容见 plain_text)"
+        
+        return f"""# PDF解析结果
+
+## 文档信息
+- 文档类型: {structured_content['document_type']}
+- 原始长度: {original_length} 字符
+- 清理后长度: {cleaned_length} 字符
+- 压缩率: {stats['compression_ratio']}%
+
+## 内容摘要
+{summary}
+
+## 关键点
+{_NL.join(f"- {point}" for point in key_points)}
+
+## 章节内容
+{_NL.join(f"### {title}{_NL}{content}{_NL}" for title, content in structured_content['sections'].items())}
+
+## 完整内容
+{full_content}
+"""
+    
+    # 导出格式按需生成，未请求的格式不构建，避免为大文档额外复制整段内容
+    export_builders = {
+        "json": build_json_export,
+        "markdown": build_markdown_export,
+        "plain_text": lambda: structured_content["full_content"],
+    }
+    
     # 构建最终输出
     ret: Output = {
         "formatted_content": {
@@ -168,7 +302,7 @@ async def main(args: Args) -> Output:
             "statistics": stats
         },
         "processing_report": {
-            "processed_at": datetime.now().isoformat(),
+            "processed_at": processed_at,
             "processing_status": "completed",
             "quality_score": min(100, max(0, int(stats["compression_ratio"] * 0.8 + len(key_points) * 5))),
             "recommendations": [
@@ -178,35 +312,8 @@ async def main(args: Args) -> Output:
             ]
         },
         "export_formats": {
-            "json": json.dumps({
-                "content": structured_content["full_content"],
-                "summary": summary,
-                "key_points": key_points,
-                "document_type": structured_content["document_type"],
-                "processed_at": datetime.now().isoformat()
-            }, ensure_ascii=False, indent=2),
-            "markdown": f"""# PDF解析结果
-
-## 文档信息
-- 文档类型: {structured_content['document_type']}
-- 原始长度: {stats['original_length']} 字符
-- 清理后长度: {stats['cleaned_length']} 字符
-- 压缩率: {stats['compression_ratio']}%
-
-## 内容摘要
-{summary}
-
-## 关键点
-{chr(10).join([f"- {point}" for point in key_points])}
-
-## 章节内容
-{chr(10).join([f"### {title}{chr(10)}{content}{chr(10)}" for title, content in structured_content['sections'].items()])}
-
-## 完整内容
-{structured_content['full_content']}
-""",
-            "plain_text": structured_content["full_content"]
+            name: build() for name, build in export_builders.items() if name in requested_exports
         }
     }
     
-    return ret
\ No newline at end of file
+    return ret
@@ -1,18 +1,483 @@
 import re
 import os
+import sys
 import json
 import time
 import asyncio
+import threading
 from datetime import datetime
-from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from itertools import compress
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+try:
+    # orjson 在 C 层完成序列化和缩进，未安装时退回标准库 json
+    import orjson
+except ImportError:
+    orjson = None
+
+# 预编译正则，避免每次调用时重复查找 re 模块缓存
+_NOTE_ID_RE = re.compile(r"/item/([a-z0-9]+)")
+_LOGIN_URL_RE = re.compile(r"login|signin|register")
+# 需要设置 httpOnly 的cookie
+_HTTP_ONLY_COOKIES = frozenset({'web_session', 'a1', 'websectiga'})
+# 调试日志中显示预览的重要cookie
+_IMPORTANT_COOKIES = frozenset({'a1', 'web_session', 'webId', 'xsecappid', 'websectiga', 'sec_poison_id'})
+# 名称中包含任一重要cookie名即视为重要cookie，合并为一个正则一次匹配
+_IMPORTANT_COOKIE_RE = re.compile("|".join(map(re.escape, sorted(_IMPORTANT_COOKIES))))
+
+
+@lru_cache(maxsize=1024)
+def _is_important_cookie(name: str) -> bool:
+    """cookie名称中是否包含任一重要cookie名；结果按名称缓存，大批量cookie中的重复名称只匹配一次"""
+    # 常见情况是名称与重要名称完全相同，一次哈希查找即可返回，其余再做子串匹配
+    return name in _IMPORTANT_COOKIES or _IMPORTANT_COOKIE_RE.search(name) is not None
+
+
+@lru_cache(maxsize=8)
+def _split_cookie_string(cookie_string: str) -> tuple:
+    """把 "k=v; k=v" 形式的cookie字符串切分为 (name, value) 元组
+    
+    单次从左到右扫描，只切出需要的 name / value，不生成中间列表；
+    结果按字符串缓存，同一份cookie字符串重复使用时无需再次切分。
+    """
+    pairs = []
+    pos = 0
+    length = len(cookie_string)
+    while pos < length:
+        term = cookie_string.find(';', pos)
+        if term == -1:
+            term = length
+        eq = cookie_string.find('=', pos, term)
+        if eq != -1:
+            pairs.append((cookie_string[pos:eq].strip(), cookie_string[eq + 1:term].strip()))
+        pos = term + 1
+    return tuple(pairs)
+
+
+def _encode_json(data) -> bytes:
+    """以 2 空格缩进编码为 UTF-8 JSON 字节；安装了 orjson 时使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _encode_json_items(items) -> list:
+    """逐个编码数组元素，并缩进到数组内一层，供 _join_json_items 拼接
+
+    JSON 字符串中的换行都已转义，字节中的换行只出现在结构位置，直接替换即可加缩进。
+    """
+    return [_encode_json(item).replace(b"\n", b"\n  ") for item in items]
+
+
+def _join_json_items(encoded_items) -> bytes:
+    """把 _encode_json_items 的结果拼成数组，与直接 _encode_json(list) 的字节完全相同"""
+    if not encoded_items:
+        return b"[]"
+    return b"[\n  " + b",\n  ".join(encoded_items) + b"\n]"
+
+
+def _write_bytes(path: str, payload: bytes) -> None:
+    """一次写入完整的文件内容"""
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
+def _write_json(path: str, data) -> None:
+    """以 2 空格缩进写入 JSON 文件
+
+    先在内存中生成完整内容再一次写入（json.dump 会按片段多次调用 write）。
+    """
+    _write_bytes(path, _encode_json(data))
+
+
+def _read_json(path: str):
+    """读取 JSON 文件；安装了 orjson 时直接解析文件字节"""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _preview(value: str, limit: int = 20) -> str:
+    """日志中显示的值预览，超出 limit 时截断并加省略号"""
+    return value[:limit] + "..." if len(value) > limit else value
+
+
+# 评论容器候选选择器，按优先级排列
+_COMMENT_SELECTORS = (
+    '[class*="comment"]',
+    '[class*="Comment"]',
+    '[data-testid*="comment"]',
+    '.comment-item',
+    '.comment-list .comment',
+    '[class*="note-comment"]',
+    '[class*="NoteComment"]',
+    '[class*="feed-comment"]',
+    '[class*="user-comment"]',
+    '[class*="interaction"]',
+)
+
+# 页面结构分析脚本（调试用）
+_ANALYZE_JS = """() => {
+    const info = {
+        totalElements: document.getElementsByTagName('*').length,
+        commentKeywords: [],
+        possibleCommentContainers: [],
+        textContent: document.body.textContent.length,
+        hasLoginButton: false,
+        hasCommentSection: false,
+        pageContent: document.body.textContent.substring(0, 500)
+    };
+
+    // 评论关键词、可能的评论容器、登录关键词各自一个统计桶，遍历一次 DOM 同时填充
+    const keywordBuckets = ['评论', 'comment', '回复', 'reply', '点赞', 'like'].map(keyword => ({
+        keyword: keyword, needle: keyword.toLowerCase(), count: 0, samples: []
+    }));
+    const containerBuckets = [
+        '[class*="comment"]', '[id*="comment"]',
+        '[class*="Comment"]', '[id*="Comment"]',
+        'section', 'div[class*="list"]',
+        '[data-testid*="comment"]',
+        '[class*="interaction"]', '[class*="note-detail"]'
+    ].map(selector => ({selector: selector, count: 0, samples: []}));
+    const loginNeedles = ['登录', 'login', '登陆', 'sign in', '请登录'];
+
+    const visit = el => {
+        // 每个元素只读取、转换一次 textContent
+        const text = el.textContent;
+        if (text) {
+            const lower = text.toLowerCase();
+            for (const bucket of keywordBuckets) {
+                if (lower.indexOf(bucket.needle) !== -1) {
+                    if (bucket.count < 3) {
+                        bucket.samples.push({
+                            tagName: el.tagName,
+                            className: el.className,
+                            textContent: text.substring(0, 100)
+                        });
+                    }
+                    bucket.count++;
+                }
+            }
+            if (!info.hasLoginButton) {
+                info.hasLoginButton = loginNeedles.some(needle => lower.indexOf(needle) !== -1);
+            }
+        }
+        for (const bucket of containerBuckets) {
+            if (el.matches(bucket.selector)) {
+                if (bucket.count < 2) {
+                    bucket.samples.push({
+                        tagName: el.tagName,
+                        className: el.className,
+                        id: el.id,
+                        textLength: text ? text.length : 0
+                    });
+                }
+                bucket.count++;
+            }
+        }
+    };
+
+    // TreeWalker 不包含根节点本身，先单独处理 <html>
+    const root = document.documentElement;
+    visit(root);
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT);
+    let node;
+    while ((node = walker.nextNode())) {
+        visit(node);
+    }
+
+    info.commentKeywords = keywordBuckets
+        .filter(bucket => bucket.count > 0)
+        .map(bucket => ({keyword: bucket.keyword, count: bucket.count, samples: bucket.samples}));
+    info.possibleCommentContainers = containerBuckets.filter(bucket => bucket.count > 0);
+
+    // 检查是否有评论区域
+    info.hasCommentSection = document.querySelector('[class*="comment"], [id*="comment"]') !== null;
+
+    return info;
+}"""
+
+# 评论提取脚本
+_EXTRACT_JS = """(debug = true) => {
+    // 文本特征匹配用的正则只构建一次
+    const CLASS_RE = /comment/i;
+    const TIME_RE = /分钟前|小时前|天前|刚刚/;
+    // 文本特征查找时检查的标签，以及最多收集的候选元素数
+    const FALLBACK_TAGS = new Set(['DIV', 'SECTION', 'ARTICLE', 'SPAN', 'P']);
+    const MAX_FALLBACK_CANDIDATES = 5000;
+
+    const debugInfo = {
+        searchResults: [],
+        finalComments: [],
+        errors: []
+    };
+
+    // 尝试多种评论选择器：先用并集选择器遍历一次 DOM，再按优先级在结果中筛选
+    const selectors = __COMMENT_SELECTORS__;
+    const candidates = document.querySelectorAll(__COMMENT_SELECTOR_UNION__);
+
+    let commentElements = [];
+
+    // 按优先级取第一个有匹配的选择器；调试模式下记录每个选择器的结果
+    if (candidates.length > 0 || debug) {
+        for (const selector of selectors) {
+            try {
+                const elements = Array.prototype.filter.call(candidates, el => el.matches(selector));
+                if (debug) {
+                    debugInfo.searchResults.push({
+                        selector: selector,
+                        found: elements.length,
+                        samples: elements.slice(0, 2).map(el => ({
+                            tagName: el.tagName,
+                            className: el.className,
+                            textLength: el.textContent ? el.textContent.length : 0,
+                            textPreview: el.textContent ? el.textContent.substring(0, 50) : ''
+                        }))
+                    });
+                }
+
+                if (elements.length > 0) {
+                    commentElements = elements;
+                    break;
+                }
+            } catch (e) {
+                debugInfo.errors.push(`选择器 ${selector} 出错: ${e.message}`);
+            }
+        }
+    }
+
+    // 如果没找到特定选择器，尝试通过文本特征查找
+    if (commentElements.length === 0) {
+        console.log('使用文本特征查找评论...');
+        // 直接遍历实时 HTMLCollection，不复制整份元素列表，收集到上限即停止
+        const allElements = document.body.getElementsByTagName('*');
+        const candidateElements = [];
+        for (let i = 0; i < allElements.length && candidateElements.length < MAX_FALLBACK_CANDIDATES; i++) {
+            const el = allElements[i];
+            if (!FALLBACK_TAGS.has(el.tagName)) {
+                continue;
+            }
+            const text = el.textContent || '';
+            // 合理的评论长度范围
+            if (text.length <= 5 || text.length >= 2000) {
+                continue;
+            }
+            // 更宽泛的匹配条件：类名或文本特征
+            if (CLASS_RE.test(el.className || '') ||
+                text.indexOf('回复') !== -1 || text.indexOf('点赞') !== -1 ||
+                text.indexOf('❤️') !== -1 || text.indexOf('👍') !== -1 ||
+                TIME_RE.test(text)) {
+                candidateElements.push(el);
+            }
+        }
+
+        commentElements = candidateElements;
+        if (debug) {
+            debugInfo.searchResults.push({
+                selector: 'text-feature-based',
+                found: candidateElements.length,
+                samples: candidateElements.slice(0, 5).map(el => ({
+                    tagName: el.tagName,
+                    className: el.className,
+                    textLength: el.textContent ? el.textContent.length : 0,
+                    textPreview: el.textContent ? el.textContent.substring(0, 50) : ''
+                }))
+            });
+        }
+    }
+
+    // 提取评论信息
+    const comments = [];
+    commentElements.forEach((element, index) => {
+        try {
+            const textContent = element.textContent?.trim() || '';
+
+            // 过滤条件更加宽松
+            if (textContent.length < 2 || 
+                textContent.includes('展开更多') ||
+                textContent.includes('查看全部') ||
+                textContent === '评论' ||
+                textContent === '点赞' ||
+                textContent === '回复' ||
+                textContent.includes('登录') ||
+                textContent.includes('注册')) {
+                return;
+            }
+
+            // 尝试提取用户名
+            let username = '';
+            const userSelectors = '[class*="user"], [class*="name"], [class*="author"], [class*="nick"]';
+            const userElements = element.querySelectorAll(userSelectors);
+            if (userElements.length > 0) {
+                username = userElements[0].textContent?.trim() || '';
+            }
+
+            // 尝试提取时间
+            let timestamp = '';
+            const timeSelectors = '[class*="time"], time, [datetime], [class*="date"]';
+            const timeElements = element.querySelectorAll(timeSelectors);
+            if (timeElements.length > 0) {
+                timestamp = timeElements[0].textContent?.trim() || 
+                           timeElements[0].getAttribute('datetime') || '';
+            }
+
+            // 尝试提取点赞数
+            let likeCount = 0;
+            const likeSelectors = '[class*="like"], [class*="heart"], [class*="thumb"]';
+            const likeElements = element.querySelectorAll(likeSelectors);
+            for (const likeEl of likeElements) {
+                const likeText = likeEl.textContent?.trim() || '';
+                const match = likeText.match(/\d+/);
+                if (match) {
+                    likeCount = parseInt(match[0]);
+                    break;
+                }
+            }
+
+            const comment = {
+                id: `comment_${index}_${Date.now()}`,
+                content: textContent,
+                username: username,
+                timestamp: timestamp,
+                like_count: likeCount,
+                element_class: element.className || '',
+                element_tag: element.tagName,
+                element_id: element.id || '',
+                extracted_at: new Date().toISOString()
+            };
+
+            comments.push(comment);
+
+        } catch (error) {
+            debugInfo.errors.push(`提取评论 ${index} 时出错: ${error.message}`);
+        }
+    });
+
+    // 去重（基于内容）：对前30个字符计算 FNV-1a 哈希，Set 中只保存数字，不保留子串
+    const hashPrefix = text => {
+        let hash = 2166136261;
+        const n = Math.min(30, text.length);
+        for (let i = 0; i < n; i++) {
+            hash ^= text.charCodeAt(i);
+            hash = Math.imul(hash, 16777619);
+        }
+        return hash >>> 0;
+    };
+    const uniqueComments = [];
+    const seenContent = new Set();
+
+    for (const comment of comments) {
+        if (comment.content.length <= 3) {
+            continue;
+        }
+        const contentKey = hashPrefix(comment.content);
+        if (!seenContent.has(contentKey)) {
+            seenContent.add(contentKey);
+            uniqueComments.push(comment);
+        }
+    }
+
+    // 调试信息中的评论副本只在调试模式下返回，避免结果被序列化两遍
+    if (debug) {
+        debugInfo.finalComments = uniqueComments;
+    }
+
+    return {
+        comments: uniqueComments,
+        debug: debugInfo
+    };
+}""".replace(
+    "__COMMENT_SELECTORS__", json.dumps(_COMMENT_SELECTORS)
+).replace(
+    "__COMMENT_SELECTOR_UNION__", json.dumps(", ".join(_COMMENT_SELECTORS))
+)
+
+# 滚动时尝试点击的"加载更多"按钮文字，按优先级排列
+_LOAD_MORE_TEXTS = (
+    "展开更多评论", "查看全部评论", "加载更多", "更多评论",
+    "展开", "更多", "查看更多", "点击查看全部评论", "显示更多评论"
+)
+
+# 读取页面高度并滚动到底部，返回滚动前的高度
+_SCROLL_TO_BOTTOM_JS = "() => { const h = document.body.scrollHeight; window.scrollTo(0, h); return h; }"
+
+# 登录状态检查脚本：关键词正则只在注册时构建一次
+# 可见性判断与 Playwright 的 is_visible 一致：包围盒非空且未设置 visibility: hidden
+_LOGIN_STATE_JS = """(() => {
+    const LOGIN_TEXT_RE = /登录|注册/;
+    const LOGIN_ELEMENT_SELECTOR = '[data-testid*="login"], [class*="login"]';
+    const LOGIN_TEXT_XPATH = "//body//text()[contains(., '登录') or contains(., '注册')]";
+
+    const isVisible = el => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+
+    return () => {
+        const hasLoginText = LOGIN_TEXT_RE.test(document.body.textContent);
+        let hasLoginButton = Array.prototype.some.call(
+            document.querySelectorAll(LOGIN_ELEMENT_SELECTOR), isVisible
+        );
+        // 页面中出现登录/注册文字时，再检查这些文字所在的元素是否可见
+        if (!hasLoginButton && hasLoginText) {
+            const nodes = document.evaluate(
+                LOGIN_TEXT_XPATH, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+            );
+            for (let i = 0; i < nodes.snapshotLength && !hasLoginButton; i++) {
+                const el = nodes.snapshotItem(i).parentElement;
+                hasLoginButton = el !== null && isVisible(el);
+            }
+        }
+        return {hasLoginButton: hasLoginButton, hasLoginText: hasLoginText};
+    };
+})()"""
+
+# 拦截的资源类型：评论提取只依赖 DOM 文本；样式表保留，滚动高度和按钮可见性判断依赖布局
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+
+async def _block_media_route(route):
+    """丢弃图片、视频和字体请求，其余请求照常发送"""
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# 每个浏览器上下文注册一次，页面中通过 window.__xhsAnalyze() / window.__xhsExtract() 调用，
+# 不必每次 evaluate 都把整段脚本传给浏览器重新解析
+_INIT_JS = f"""
+window.__xhsAnalyze = {_ANALYZE_JS};
+window.__xhsExtract = {_EXTRACT_JS};
+window.__xhsLoginState = {_LOGIN_STATE_JS};
+"""
 
 class XHSCommentScraper:
     """小红书评论爬取器"""
     
-    def __init__(self, headless=True, timeout=30, debug=True):
+    def __init__(self, headless=True, timeout=30, debug=True, block_media=True,
+                 save_screenshots=False, screenshot_dir=None):
         self.headless = headless
         self.timeout = timeout
         self.debug = debug
+        # 只需要页面文本，默认拦截图片、视频和字体请求
+        self.block_media = block_media
+        # 调试截图仅在 debug 且 save_screenshots 时保存，默认保存到 xhs 目录
+        self.save_screenshots = save_screenshots
+        self.screenshot_dir = screenshot_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # 日志时间戳按秒缓存，同一秒内的多条日志共用一次 strftime 结果
+        self._ts_sec = 0
+        self._ts_str = ""
+        # 浏览器、上下文在多次爬取间复用，由 open() / close() 管理
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._cookie_source = None
+        self._cookie_extractor = None
         self.user_agent = (
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
             "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -22,12 +487,15 @@ class XHSCommentScraper:
     def log(self, message, level="INFO"):
         """调试日志输出"""
         if self.debug:
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            print(f"[{timestamp}] {level}: {message}")
+            now = int(time.time())
+            if now != self._ts_sec:
+                self._ts_sec = now
+                self._ts_str = time.strftime("%H:%M:%S", time.localtime(now))
+            print(f"[{self._ts_str}] {level}: {message}")
     
     def extract_note_id(self, url: str) -> str | None:
         """从URL中提取笔记ID"""
-        match = re.search(r"/item/([a-z0-9]+)", url)
+        match = _NOTE_ID_RE.search(url)
         note_id = match.group(1) if match else None
         self.log(f"提取笔记ID: {note_id}")
         return note_id
@@ -40,44 +508,29 @@ class XHSCommentScraper:
         
         self.log("开始解析Cookie字符串...")
         
-        # 分割cookie字符串
-        cookie_pairs = [pair.strip() for pair in cookie_string.split(';') if pair.strip()]
+        # 设置过期时间（24小时后），所有cookie共用同一个时间戳
+        expires_timestamp = int(time.time()) + (24 * 60 * 60)
         
+        debug = self.debug
         valid_cookies = []
-        for pair in cookie_pairs:
-            if '=' not in pair:
-                continue
-                
-            name, value = pair.split('=', 1)
-            name = name.strip()
-            value = value.strip()
-            
-            # 创建cookie对象
+        for name, value in _split_cookie_string(cookie_string):
+            # 创建cookie对象，特殊属性根据小红书的实际cookie特性设置
             cookie = {
                 "name": name,
                 "value": value,
                 "domain": ".xiaohongshu.com",
                 "path": "/",
-                "httpOnly": False,
+                "httpOnly": name in _HTTP_ONLY_COOKIES,
                 "secure": True,
-                "sameSite": "Lax"
+                "sameSite": "Lax",
+                "expires": expires_timestamp
             }
             
-            # 设置特殊属性 - 根据小红书的实际cookie特性
-            if name in ['web_session', 'a1', 'websectiga']:
-                cookie["httpOnly"] = True
-            
-            # 设置过期时间（24小时后）
-            import time
-            expires_timestamp = int(time.time()) + (24 * 60 * 60)
-            cookie["expires"] = expires_timestamp
-            
             valid_cookies.append(cookie)
             
-            # 记录重要cookie信息
-            if name in ['a1', 'web_session', 'webId', 'xsecappid', 'websectiga', 'sec_poison_id']:
-                value_preview = value[:20] + "..." if len(value) > 20 else value
-                self.log(f"  解析到重要cookie: {name} = {value_preview}")
+            # 记录重要cookie信息（仅调试模式下生成预览）
+            if debug and name in _IMPORTANT_COOKIES:
+                self.log(f"  解析到重要cookie: {name} = {_preview(value)}")
         
         self.log(f"成功解析 {len(valid_cookies)} 个cookies")
         return valid_cookies
@@ -125,41 +578,34 @@ class XHSCommentScraper:
                     cookies = [data]
                 else:
                     # 可能是其他格式，尝试找到cookies字段
-                    for key, value in data.items():
-                        if isinstance(value, list) and len(value) > 0 and "name" in value[0]:
-                            cookies = value
-                            break
+                    cookies = next((value for value in data.values()
+                                    if isinstance(value, list) and value
+                                    and isinstance(value[0], dict) and "name" in value[0]), None)
             
             if not cookies:
                 self.log("cookies格式不正确或为空", "ERROR")
                 return None
             
-            # 验证cookies格式
+            # 🔧 过期时间（设置为24小时后过期），所有cookie共用同一个时间戳
+            expires_timestamp = int(time.time()) + (24 * 60 * 60)  # 24小时
+            
+            # 验证cookies格式，一次遍历补齐必要字段
             valid_cookies = []
             for cookie in cookies:
                 if isinstance(cookie, dict) and "name" in cookie and "value" in cookie:
-                    # 确保必要的字段存在
-                    if "domain" not in cookie:
-                        cookie["domain"] = ".xiaohongshu.com"
-                    if "path" not in cookie:
-                        cookie["path"] = "/"
-                    
-                    # 🔧 添加过期时间（设置为24小时后过期）
-                    if "expires" not in cookie and "maxAge" not in cookie:
-                        import time
-                        expires_timestamp = int(time.time()) + (24 * 60 * 60)  # 24小时
-                        cookie["expires"] = expires_timestamp
-                    
+                    cookie.setdefault("domain", ".xiaohongshu.com")
+                    cookie.setdefault("path", "/")
+                    if "maxAge" not in cookie:
+                        cookie.setdefault("expires", expires_timestamp)
                     valid_cookies.append(cookie)
             
             self.log(f"成功加载 {len(valid_cookies)} 个有效cookies")
             
             # 显示重要cookies信息
-            important_names = ['web_session', 'a1', 'webId', 'xsecappid']
-            for cookie in valid_cookies:
-                if cookie['name'] in important_names:
-                    value_preview = cookie['value'][:20] + "..." if len(cookie['value']) > 20 else cookie['value']
-                    self.log(f"  - {cookie['name']}: {value_preview}")
+            if self.debug:
+                for cookie in valid_cookies:
+                    if cookie['name'] in _IMPORTANT_COOKIES:
+                        self.log(f"  - {cookie['name']}: {_preview(cookie['value'])}")
             
             return valid_cookies
             
@@ -172,32 +618,14 @@ class XHSCommentScraper:
         self.log("检查登录状态...")
         
         try:
-            # 等待页面加载
-            await page.wait_for_timeout(2000)
-            
-            # 检查是否有登录相关的元素
-            login_indicators = [
-                "text=登录", "text=注册", "text=立即登录",
-                "[data-testid*='login']", "[class*='login']"
-            ]
-            
-            has_login_button = False
-            for indicator in login_indicators:
-                try:
-                    element = await page.query_selector(indicator)
-                    if element and await element.is_visible():
-                        has_login_button = True
-                        break
-                except:
-                    continue
+            # 页面已由调用方等待加载完成，这里直接检查是否有可见的登录元素、页面内容是否包含登录关键词，在页面内一次完成，只返回两个布尔值
+            login_state = await page.evaluate("window.__xhsLoginState()")
+            has_login_button = login_state["hasLoginButton"]
+            has_login_text = login_state["hasLoginText"]
             
             # 检查当前URL
             current_url = page.url
-            is_login_page = any(keyword in current_url.lower() for keyword in ['login', 'signin', 'register'])
-            
-            # 检查页面内容
-            page_text = await page.evaluate("document.body.textContent")
-            has_login_text = any(keyword in page_text for keyword in ['请登录', '登录', '注册'])
+            is_login_page = _LOGIN_URL_RE.search(current_url.lower()) is not None
             
             if has_login_button or is_login_page or has_login_text:
                 self.log("❌ 检测到未登录状态", "WARNING")
@@ -227,92 +655,18 @@ class XHSCommentScraper:
         ready_state = await page.evaluate("document.readyState")
         self.log(f"页面加载状态: {ready_state}")
         
-        # 分析页面中包含"评论"相关的元素
-        analysis_js = """
-        (() => {
-            const info = {
-                totalElements: document.querySelectorAll('*').length,
-                commentKeywords: [],
-                possibleCommentContainers: [],
-                textContent: document.body.textContent.length,
-                hasLoginButton: false,
-                hasCommentSection: false,
-                pageContent: document.body.textContent.substring(0, 500)
-            };
-            
-            // 查找包含评论关键词的元素
-            const keywords = ['评论', 'comment', '回复', 'reply', '点赞', 'like'];
-            keywords.forEach(keyword => {
-                const elements = Array.from(document.querySelectorAll('*')).filter(el => {
-                    return el.textContent && el.textContent.toLowerCase().includes(keyword.toLowerCase());
-                });
-                if (elements.length > 0) {
-                    info.commentKeywords.push({
-                        keyword: keyword,
-                        count: elements.length,
-                        samples: elements.slice(0, 3).map(el => ({
-                            tagName: el.tagName,
-                            className: el.className,
-                            textContent: el.textContent.substring(0, 100)
-                        }))
-                    });
-                }
-            });
-            
-            // 查找可能的评论容器
-            const containerSelectors = [
-                '[class*="comment"]', '[id*="comment"]',
-                '[class*="Comment"]', '[id*="Comment"]',
-                'section', 'div[class*="list"]',
-                '[data-testid*="comment"]',
-                '[class*="interaction"]', '[class*="note-detail"]'
-            ];
-            
-            containerSelectors.forEach(selector => {
-                try {
-                    const elements = document.querySelectorAll(selector);
-                    if (elements.length > 0) {
-                        info.possibleCommentContainers.push({
-                            selector: selector,
-                            count: elements.length,
-                            samples: Array.from(elements).slice(0, 2).map(el => ({
-                                tagName: el.tagName,
-                                className: el.className,
-                                id: el.id,
-                                textLength: el.textContent ? el.textContent.length : 0
-                            }))
-                        });
-                    }
-                } catch (e) {}
-            });
-            
-            // 检查是否有登录相关元素
-            const loginKeywords = ['登录', 'login', '登陆', 'sign in', '请登录'];
-            loginKeywords.forEach(keyword => {
-                const loginElements = Array.from(document.querySelectorAll('*')).filter(el => {
-                    return el.textContent && el.textContent.toLowerCase().includes(keyword.toLowerCase());
-                });
-                if (loginElements.length > 0) {
-                    info.hasLoginButton = true;
-                }
-            });
-            
-            // 检查是否有评论区域
-            const commentSections = document.querySelectorAll('[class*="comment"], [id*="comment"]');
-            info.hasCommentSection = commentSections.length > 0;
-            
-            return info;
-        })();
-        """
-        
+        # 分析页面中包含"评论"相关的元素（脚本已通过 _INIT_JS 注册到页面）
         try:
-            analysis = await page.evaluate(analysis_js)
+            analysis = await page.evaluate("window.__xhsAnalyze()")
             
             self.log(f"页面总元素数: {analysis['totalElements']}")
             self.log(f"页面文本长度: {analysis['textContent']}")
             self.log(f"是否检测到登录按钮: {analysis['hasLoginButton']}")
             self.log(f"是否检测到评论区域: {analysis['hasCommentSection']}")
             
+            if not self.debug:
+                return analysis
+            
             # 显示页面内容预览
             self.log(f"页面内容预览: {analysis.get('pageContent', '')[:200]}...")
             
@@ -340,36 +694,38 @@ class XHSCommentScraper:
         last_height = 0
         stable_rounds = 0
         
+        # "加载更多"按钮的定位器只构建一次，每轮复用
+        load_more_locators = [
+            (text, page.locator(f"text={text} >> visible=true"))
+            for text in _LOAD_MORE_TEXTS
+        ]
+        
         for round_num in range(max_rounds):
             self.log(f"第 {round_num + 1}/{max_rounds} 轮滚动")
             
-            # 获取当前页面高度
-            curr_height = await page.evaluate("document.body.scrollHeight")
+            # 获取当前页面高度并滚动到页面底部（一次 evaluate 完成）
+            curr_height = await page.evaluate(_SCROLL_TO_BOTTOM_JS)
             self.log(f"当前页面高度: {curr_height}")
             
-            # 滚动到页面底部
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await page.wait_for_timeout(int(sleep_sec * 1000))
+            # 等待新内容撑高页面，最多等待 sleep_sec 秒，内容加载完成即可继续
+            try:
+                await page.wait_for_function(
+                    f"document.body.scrollHeight > {curr_height}",
+                    timeout=int(sleep_sec * 1000)
+                )
+            except PlaywrightTimeoutError:
+                pass
             
             # 尝试点击各种"加载更多"按钮
-            load_more_texts = [
-                "展开更多评论", "查看全部评论", "加载更多", "更多评论", 
-                "展开", "更多", "查看更多", "点击查看全部评论", "显示更多评论"
-            ]
-            
             clicked_button = False
-            for text in load_more_texts:
+            for text, locator in load_more_locators:
                 try:
-                    # 查找并点击按钮
-                    buttons = await page.query_selector_all(f"text={text}")
-                    for button in buttons:
-                        if await button.is_visible():
-                            await button.click(timeout=2000)
-                            self.log(f"点击了'{text}'按钮")
-                            await page.wait_for_timeout(1000)
-                            clicked_button = True
-                            break
-                    if clicked_button:
+                    # 只在存在可见按钮时点击第一个
+                    if await locator.count():
+                        await locator.first.click(timeout=2000)
+                        self.log(f"点击了'{text}'按钮")
+                        await page.wait_for_timeout(1000)
+                        clicked_button = True
                         break
                 except Exception as e:
                     self.log(f"点击'{text}'按钮失败: {e}", "DEBUG")
@@ -395,186 +751,20 @@ class XHSCommentScraper:
         """提取评论数据"""
         self.log("开始提取评论数据...")
         
-        # 增强的JavaScript代码用于提取评论
-        js_code = """
-        (() => {
-            const debugInfo = {
-                searchResults: [],
-                finalComments: [],
-                errors: []
-            };
-            
-            // 尝试多种评论选择器
-            const selectors = [
-                '[class*="comment"]',
-                '[class*="Comment"]', 
-                '[data-testid*="comment"]',
-                '.comment-item',
-                '.comment-list .comment',
-                '[class*="note-comment"]',
-                '[class*="NoteComment"]',
-                '[class*="feed-comment"]',
-                '[class*="user-comment"]',
-                '[class*="interaction"]'
-            ];
-            
-            let commentElements = [];
-            
-            // 尝试每个选择器并记录结果
-            for (const selector of selectors) {
-                try {
-                    const elements = document.querySelectorAll(selector);
-                    debugInfo.searchResults.push({
-                        selector: selector,
-                        found: elements.length,
-                        samples: Array.from(elements).slice(0, 2).map(el => ({
-                            tagName: el.tagName,
-                            className: el.className,
-                            textLength: el.textContent ? el.textContent.length : 0,
-                            textPreview: el.textContent ? el.textContent.substring(0, 50) : ''
-                        }))
-                    });
-                    
-                    if (elements.length > 0) {
-                        commentElements = Array.from(elements);
-                        break;
-                    }
-                } catch (e) {
-                    debugInfo.errors.push(`选择器 ${selector} 出错: ${e.message}`);
-                }
-            }
-            
-            // 如果没找到特定选择器，尝试通过文本特征查找
-            if (commentElements.length === 0) {
-                console.log('使用文本特征查找评论...');
-                const allElements = document.querySelectorAll('div, section, article, span, p');
-                const candidateElements = Array.from(allElements).filter(el => {
-                    const text = el.textContent || '';
-                    const className = el.className || '';
-                    
-                    // 更宽泛的匹配条件
-                    return (
-                        text.length > 5 && text.length < 2000 && // 合理的评论长度范围
-                        (className.toLowerCase().includes('comment') ||
-                         text.includes('回复') || text.includes('点赞') ||
-                         text.includes('❤️') || text.includes('👍') ||
-                         text.includes('分钟前') || text.includes('小时前') ||
-                         text.includes('天前') || text.includes('刚刚'))
-                    );
-                });
-                
-                commentElements = candidateElements;
-                debugInfo.searchResults.push({
-                    selector: 'text-feature-based',
-                    found: candidateElements.length,
-                    samples: candidateElements.slice(0, 5).map(el => ({
-                        tagName: el.tagName,
-                        className: el.className,
-                        textLength: el.textContent ? el.textContent.length : 0,
-                        textPreview: el.textContent ? el.textContent.substring(0, 50) : ''
-                    }))
-                });
-            }
-            
-            // 提取评论信息
-            const comments = [];
-            commentElements.forEach((element, index) => {
-                try {
-                    const textContent = element.textContent?.trim() || '';
-                    
-                    // 过滤条件更加宽松
-                    if (textContent.length < 2 || 
-                        textContent.includes('展开更多') ||
-                        textContent.includes('查看全部') ||
-                        textContent === '评论' ||
-                        textContent === '点赞' ||
-                        textContent === '回复' ||
-                        textContent.includes('登录') ||
-                        textContent.includes('注册')) {
-                        return;
-                    }
-                    
-                    // 尝试提取用户名
-                    let username = '';
-                    const userSelectors = '[class*="user"], [class*="name"], [class*="author"], [class*="nick"]';
-                    const userElements = element.querySelectorAll(userSelectors);
-                    if (userElements.length > 0) {
-                        username = userElements[0].textContent?.trim() || '';
-                    }
-                    
-                    // 尝试提取时间
-                    let timestamp = '';
-                    const timeSelectors = '[class*="time"], time, [datetime], [class*="date"]';
-                    const timeElements = element.querySelectorAll(timeSelectors);
-                    if (timeElements.length > 0) {
-                        timestamp = timeElements[0].textContent?.trim() || 
-                                   timeElements[0].getAttribute('datetime') || '';
-                    }
-                    
-                    // 尝试提取点赞数
-                    let likeCount = 0;
-                    const likeSelectors = '[class*="like"], [class*="heart"], [class*="thumb"]';
-                    const likeElements = element.querySelectorAll(likeSelectors);
-                    for (const likeEl of likeElements) {
-                        const likeText = likeEl.textContent?.trim() || '';
-                        const match = likeText.match(/\d+/);
-                        if (match) {
-                            likeCount = parseInt(match[0]);
-                            break;
-                        }
-                    }
-                    
-                    const comment = {
-                        id: `comment_${index}_${Date.now()}`,
-                        content: textContent,
-                        username: username,
-                        timestamp: timestamp,
-                        like_count: likeCount,
-                        element_class: element.className || '',
-                        element_tag: element.tagName,
-                        element_id: element.id || '',
-                        extracted_at: new Date().toISOString()
-                    };
-                    
-                    comments.push(comment);
-                    
-                } catch (error) {
-                    debugInfo.errors.push(`提取评论 ${index} 时出错: ${error.message}`);
-                }
-            });
-            
-            // 去重（基于内容）
-            const uniqueComments = [];
-            const seenContent = new Set();
-            
-            for (const comment of comments) {
-                const contentKey = comment.content.substring(0, 30); // 使用前30个字符作为去重依据
-                if (!seenContent.has(contentKey) && comment.content.length > 3) {
-                    seenContent.add(contentKey);
-                    uniqueComments.push(comment);
-                }
-            }
-            
-            debugInfo.finalComments = uniqueComments;
-            
-            return {
-                comments: uniqueComments,
-                debug: debugInfo
-            };
-        })();
-        """
-        
+        # 调用已注册到页面的评论提取脚本
         try:
-            result = await page.evaluate(js_code)
+            result = await page.evaluate("debug => window.__xhsExtract(debug)", self.debug)
             comments = result['comments']
             debug_info = result['debug']
             
             # 输出详细的调试信息
-            self.log(f"选择器搜索结果:")
-            for search in debug_info['searchResults']:
-                self.log(f"  - {search['selector']}: 找到 {search['found']} 个元素")
-                for sample in search['samples']:
-                    self.log(f"    * {sample['tagName']}.{sample['className']}: '{sample['textPreview']}'...")
+            debug = self.debug
+            if debug:
+                self.log(f"选择器搜索结果:")
+                for search in debug_info['searchResults']:
+                    self.log(f"  - {search['selector']}: 找到 {search['found']} 个元素")
+                    for sample in search['samples']:
+                        self.log(f"    * {sample['tagName']}.{sample['className']}: '{sample['textPreview']}'...")
             
             if debug_info['errors']:
                 self.log("提取过程中的错误:")
@@ -584,7 +774,7 @@ class XHSCommentScraper:
             self.log(f"成功提取到 {len(comments)} 条评论")
             
             # 显示前几条评论的详细信息
-            if comments:
+            if debug and comments:
                 self.log("前3条评论详情:")
                 for i, comment in enumerate(comments[:3], 1):
                     self.log(f"  评论 {i}:")
@@ -600,41 +790,85 @@ class XHSCommentScraper:
             return []
     
     async def take_screenshot(self, page, filename):
-        """截图保存用于调试"""
+        """截图保存用于调试（只截取可视区域，JPEG 编码）"""
+        if not (self.debug and self.save_screenshots):
+            return
         try:
-            screenshot_path = f"/Users/ankanghao/AiProjects/coze_study/xhs/{filename}"
-            await page.screenshot(path=screenshot_path, full_page=True)
+            screenshot_path = os.path.join(self.screenshot_dir, filename)
+            await page.screenshot(path=screenshot_path, type="jpeg", quality=60, full_page=False)
             self.log(f"截图已保存: {screenshot_path}")
         except Exception as e:
             self.log(f"截图失败: {e}", "ERROR")
     
+    async def open(self, cookies_path: str = None, cookie_string: str = None):
+        """启动浏览器并创建上下文，之后多次 scrape_comments 共用；已启动时只补充导入新的cookies"""
+        if self._context is None:
+            self.log("正在启动浏览器...")
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=['--no-sandbox', '--disable-blink-features=AutomationControlled']
+            )
+            
+            self._context = await self._browser.new_context(
+                user_agent=self.user_agent,
+                viewport={'width': 1280, 'height': 900},
+                locale='zh-CN'
+            )
+            # 注册页面分析和评论提取脚本，该上下文中的所有页面共用
+            await self._context.add_init_script(_INIT_JS)
+            if self.block_media:
+                await self._context.route("**/*", _block_media_route)
+        
+        # 同一份cookies只解析、导入一次
+        cookie_source = (cookies_path, cookie_string)
+        if (cookies_path or cookie_string) and cookie_source != self._cookie_source:
+            # 加载cookies - 优先使用cookie字符串
+            cookies = self.load_cookies(cookies_path, cookie_string)
+            if cookies:
+                try:
+                    await self._context.add_cookies(cookies)
+                    self._cookie_source = cookie_source
+                    self.log("✅ 已成功导入cookies")
+                except Exception as e:
+                    self.log(f"❌ 导入cookies失败: {e}", "ERROR")
+                    self.log("   继续尝试无cookies访问...")
+    
+    async def close(self):
+        """关闭浏览器上下文、浏览器并停止 Playwright"""
+        if self._context is not None:
+            await self._context.close()
+            self._context = None
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        self._cookie_source = None
+        if self._cookie_extractor is not None:
+            await self._cookie_extractor.aclose()
+            self._cookie_extractor = None
+    
+    async def __aenter__(self):
+        await self.open()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
     async def scrape_comments(self, url: str, cookies_path: str = None, cookie_string: str = None, max_scrolls: int = 30):
-        """爬取指定URL的评论 - 支持cookie文件或直接的cookie字符串"""
+        """爬取指定URL的评论 - 支持cookie文件或直接的cookie字符串
+        
+        在 async with 或 open() 之后调用时复用同一个浏览器，每个URL只新建一个页面；
+        单独调用时爬取结束即关闭浏览器。
+        """
+        owns_browser = self._context is None
         try:
-            async with async_playwright() as playwright:
-                self.log("正在启动浏览器...")
-                browser = await playwright.chromium.launch(
-                    headless=self.headless,
-                    args=['--no-sandbox', '--disable-blink-features=AutomationControlled']
-                )
-                
-                context = await browser.new_context(
-                    user_agent=self.user_agent,
-                    viewport={'width': 1280, 'height': 900},
-                    locale='zh-CN'
-                )
-                
-                # 加载cookies - 优先使用cookie字符串
-                cookies = self.load_cookies(cookies_path, cookie_string)
-                if cookies:
-                    try:
-                        await context.add_cookies(cookies)
-                        self.log("✅ 已成功导入cookies")
-                    except Exception as e:
-                        self.log(f"❌ 导入cookies失败: {e}", "ERROR")
-                        self.log("   继续尝试无cookies访问...")
-                
-                page = await context.new_page()
+            await self.open(cookies_path, cookie_string)
+            
+            page = await self._context.new_page()
+            try:
                 page.set_default_timeout(self.timeout * 1000)
                 
                 self.log(f"正在访问页面: {url}")
@@ -644,34 +878,101 @@ class XHSCommentScraper:
                 self.log("等待页面加载...")
                 await page.wait_for_timeout(3000)
                 
-                # 检查登录状态
-                is_logged_in = await self.check_login_status(page)
+                # 上面的等待是三者共用的加载等待；检查登录状态、分析页面结构、截图保存当前状态互不依赖，并发执行
+                is_logged_in, _, _ = await asyncio.gather(
+                    self.check_login_status(page),
+                    self.analyze_page_structure(page),
+                    self.take_screenshot(page, "page_initial.jpg")
+                )
                 if not is_logged_in:
                     self.log("❌ 未检测到登录状态，可能需要有效的cookies", "WARNING")
                 
-                # 分析页面结构
-                await self.analyze_page_structure(page)
-                
-                # 截图保存当前状态
-                await self.take_screenshot(page, "page_initial.png")
-                
                 # 滚动加载更多评论
                 await self.scroll_and_load_comments(page, max_rounds=max_scrolls)
                 
                 # 截图保存滚动后状态
-                await self.take_screenshot(page, "page_after_scroll.png")
+                await self.take_screenshot(page, "page_after_scroll.jpg")
                 
                 # 提取评论数据
-                comments = await self.extract_comments(page)
-                
-                await context.close()
-                await browser.close()
-                
-                return comments
+                return await self.extract_comments(page)
+            finally:
+                await page.close()
                 
         except Exception as e:
             self.log(f"爬取过程中出错: {e}", "ERROR")
             return []
+        finally:
+            if owns_browser:
+                await self.close()
+    
+    async def check_cookies_validity(self, page):
+        """检查cookies是否仍然有效"""
+        try:
+            # 访问需要登录的页面，DOM 就绪即可判断，无需固定等待
+            await page.goto("https://www.xiaohongshu.com/user/profile/xxx", wait_until="domcontentloaded")
+            
+            # 未登录时由前端跳转到登录页，最多等待 3 秒；期间没有跳转视为仍已登录
+            try:
+                await page.wait_for_url(
+                    lambda url: "login" in url.lower() or "signin" in url.lower(),
+                    wait_until="commit",
+                    timeout=3000
+                )
+            except PlaywrightTimeoutError:
+                pass
+            
+            # 检查是否被重定向到登录页面
+            current_url = page.url
+            if "login" in current_url.lower() or "signin" in current_url.lower():
+                self.log("❌ Cookies已失效，需要重新获取", "WARNING")
+                return False
+            
+            return True
+        except:
+            return False
+    
+    async def check_cookie_files_validity(self, cookie_files):
+        """并发检查多个cookies文件是否有效：共用一个浏览器，每个文件使用独立的上下文
+        
+        返回与 cookie_files 顺序一致的检查结果列表。
+        """
+        owns_browser = self._context is None
+        await self.open()
+        
+        async def check_one(cookie_file):
+            cookies = self.load_cookies(cookie_file)
+            if not cookies:
+                return False
+            context = await self._browser.new_context(
+                user_agent=self.user_agent,
+                viewport={'width': 1280, 'height': 900},
+                locale='zh-CN'
+            )
+            try:
+                await context.add_cookies(cookies)
+                page = await context.new_page()
+                return await self.check_cookies_validity(page)
+            finally:
+                await context.close()
+        
+        try:
+            return list(await asyncio.gather(*(check_one(cookie_file) for cookie_file in cookie_files)))
+        finally:
+            if owns_browser:
+                await self.close()
+    
+    async def refresh_cookies_if_needed(self, page, cookies_path):
+        """如果cookies失效，提示重新获取"""
+        if not await self.check_cookies_validity(page):
+            self.log("🔄 正在尝试重新获取cookies...")
+            # 调用cookie提取器；提取器在多次刷新间复用，其浏览器空闲后自动关闭，最迟随 close() 一起关闭
+            if self._cookie_extractor is None:
+                self._cookie_extractor = XHSCookieExtractor()
+            # 已确认失效，不能再返回缓存中的旧cookies
+            self._cookie_extractor.invalidate_cache(cookies_path)
+            new_cookies = await self._cookie_extractor.extract_cookies_manual(cookies_path)
+            return new_cookies
+        return None
     
     def save_comments(self, comments, output_file, url):
         """保存评论数据到文件"""
@@ -690,27 +991,32 @@ class XHSCommentScraper:
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
         # 保存为JSON格式
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
+        _write_json(output_file, result_data)
         
         self.log(f"成功保存 {len(comments)} 条评论到: {output_file}")
         
         # 同时保存一个纯文本版本方便查看
         txt_file = output_file.replace('.json', '.txt')
-        with open(txt_file, "w", encoding="utf-8") as f:
-            f.write(f"小红书笔记评论 - {note_id}\n")
-            f.write(f"URL: {url}\n")
-            f.write(f"爬取时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"评论总数: {len(comments)}\n")
-            f.write("=" * 50 + "\n\n")
-            
-            for i, comment in enumerate(comments, 1):
-                f.write(f"{i}. {comment.get('username', '匿名用户')}\n")
-                f.write(f"   时间: {comment.get('timestamp', '未知')}\n")
-                f.write(f"   内容: {comment['content']}\n")
-                f.write(f"   点赞: {comment.get('like_count', 0)}\n")
-                f.write(f"   元素信息: {comment.get('element_tag', 'unknown')}.{comment.get('element_class', 'none')}\n")
-                f.write("-" * 30 + "\n")
+        # 先拼出完整文本再一次写入
+        parts = [
+            f"小红书笔记评论 - {note_id}\n"
+            f"URL: {url}\n"
+            f"爬取时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"评论总数: {len(comments)}\n"
+            + "=" * 50 + "\n\n"
+        ]
+        separator = "-" * 30 + "\n"
+        parts.extend(
+            f"{i}. {comment.get('username', '匿名用户')}\n"
+            f"   时间: {comment.get('timestamp', '未知')}\n"
+            f"   内容: {comment['content']}\n"
+            f"   点赞: {comment.get('like_count', 0)}\n"
+            f"   元素信息: {comment.get('element_tag', 'unknown')}.{comment.get('element_class', 'none')}\n"
+            + separator
+            for i, comment in enumerate(comments, 1)
+        )
+        with open(txt_file, "w", encoding="utf-8", buffering=1 << 20) as f:
+            f.write("".join(parts))
         
         self.log(f"同时保存文本版本到: {txt_file}")
 
@@ -718,106 +1024,375 @@ import json
 import asyncio
 from playwright.async_api import async_playwright
 
+# cookies文件中每个cookie必须包含的字段
+_REQUIRED_COOKIE_FIELDS = frozenset({'name', 'value', 'domain'})
+# 提取结果的缓存有效期（秒），与cookie默认的24小时过期相比留足余量
+_EXTRACT_CACHE_TTL = 60 * 60
+# 持久化上下文连续提取多少次后重建
+_PERSISTENT_CONTEXT_MAX_USES = 20
+# 最后一个会话结束后，自动打开的浏览器再保留多少秒才关闭
+_SESSION_IDLE_CLOSE_DELAY = 30
+# 等待手动登录的最长时间（秒），超时后按当前状态直接提取
+_LOGIN_WAIT_TIMEOUT = 300
+
+
+# 登录响应 Set-Cookie 头中的 web_session 值（多个 Set-Cookie 以换行分隔）
+_WEB_SESSION_SET_COOKIE_RE = re.compile(r"(?m)^\s*web_session=([^;\r\n]*)")
+# web_session 变化后，由这些类型的响应触发页面登录状态检查
+_LOGIN_CHECK_RESOURCE_TYPES = frozenset({"xhr", "fetch"})
+
+# 终端回车由一个常驻的守护线程读取，整个进程只启动一次；
+# 回车只交给当前正在等待的提取，没有提取在等待时按下的回车直接丢弃
+_stdin_reader_lock = threading.Lock()
+_stdin_reader_started = False
+_enter_waiter = None  # (事件循环, Future)
+
+
+def _read_stdin_lines():
+    """守护线程：逐行读取标准输入，每读到一行就唤醒当前等待回车的 Future"""
+    while True:
+        try:
+            line = sys.stdin.readline()
+        except (OSError, ValueError):
+            line = ""
+        if not line:
+            # 标准输入不可用或已关闭时只依赖浏览器事件
+            return
+        with _stdin_reader_lock:
+            waiter = _enter_waiter
+        if waiter is None:
+            continue
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(_resolve_enter, future)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+
+def _resolve_enter(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _clear_enter_waiter(future):
+    global _enter_waiter
+    with _stdin_reader_lock:
+        if _enter_waiter is not None and _enter_waiter[1] is future:
+            _enter_waiter = None
+
+
+def _wait_for_enter(prompt):
+    """提示用户按回车，返回回车后完成的 Future；Future 完成或取消后自动注销
+
+    读取标准输入的守护线程全进程共用一个，不随每次提取新建：
+    登录由浏览器事件先行完成时，上一次提取不会留下阻塞在 input() 上、抢走下一次回车的线程。
+    """
+    global _stdin_reader_started, _enter_waiter
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    with _stdin_reader_lock:
+        _enter_waiter = (loop, future)
+        if not _stdin_reader_started:
+            _stdin_reader_started = True
+            threading.Thread(target=_read_stdin_lines, daemon=True).start()
+    future.add_done_callback(_clear_enter_waiter)
+    print(prompt, end="", flush=True)
+    return future
+
 class XHSCookieExtractor:
     """小红书Cookie提取工具"""
     
-    def __init__(self):
+    def __init__(self, headless=False, profile_dir=None):
+        self.headless = headless  # 需要手动登录，默认非无头模式
+        # 指定 profile_dir 时使用持久化的浏览器配置目录，登录状态保存在磁盘上，下次运行无需重新登录
+        self.profile_dir = profile_dir
         self.user_agent = (
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
             "AppleWebKit/537.36 (KHTML, like Gecko) "
             "Chrome/124.0.0.0 Safari/537.36"
         )
+        # 浏览器在多次提取间复用，每次提取只新建一个上下文，由 open() / aclose() 管理
+        self._playwright = None
+        self._browser = None
+        # 持久化模式下整个浏览器只有这一个上下文，定期重建以释放长时间运行积累的内存
+        self._persistent_context = None
+        self._persistent_uses = 0
+        # 提取结果缓存：output_file -> (提取时间, cookies)
+        self._extract_cache = {}
+        # session() 的引用计数：由 session() 自动打开的浏览器在计数归零并空闲一段时间后才关闭
+        self._session_count = 0
+        self._session_lock = asyncio.Lock()
+        self._auto_opened = False
+        self._idle_close_task = None
+    
+    def invalidate_cache(self, output_file=None):
+        """清除指定输出文件（未指定时为全部）的提取结果缓存"""
+        if output_file is None:
+            self._extract_cache.clear()
+        else:
+            self._extract_cache.pop(output_file, None)
     
-    async def extract_cookies_manual(self, output_file="xhs_cookies.json"):
-        """手动登录并提取cookies"""
+    async def open(self):
+        """启动浏览器（或持久化上下文）；已启动时直接返回"""
+        if self._browser is not None or self._persistent_context is not None:
+            return
+        self._playwright = await async_playwright().start()
+        if self.profile_dir:
+            self._persistent_context = await self._playwright.chromium.launch_persistent_context(
+                self.profile_dir,
+                headless=self.headless,
+                user_agent=self.user_agent,
+                viewport={'width': 1280, 'height': 900}
+            )
+            self._persistent_uses = 0
+        else:
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+    
+    async def aclose(self):
+        """关闭浏览器并停止 Playwright"""
+        self._cancel_idle_close()
+        self._auto_opened = False
+        if self._persistent_context is not None:
+            await self._persistent_context.close()
+            self._persistent_context = None
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+    
+    async def __aenter__(self):
+        await self.open()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    def _cancel_idle_close(self):
+        """取消尚未执行的空闲关闭"""
+        task, self._idle_close_task = self._idle_close_task, None
+        if task is not None:
+            task.cancel()
+    
+    async def _close_when_idle(self):
+        """空闲 _SESSION_IDLE_CLOSE_DELAY 秒后关闭浏览器；事件循环退出时被取消也会关闭"""
+        task = asyncio.current_task()
+        try:
+            await asyncio.sleep(_SESSION_IDLE_CLOSE_DELAY)
+        except asyncio.CancelledError:
+            # 被新的会话取消时 _idle_close_task 已清空，浏览器继续复用
+            if self._idle_close_task is task:
+                self._idle_close_task = None
+                await self.aclose()
+            raise
+        async with self._session_lock:
+            if self._idle_close_task is task and self._session_count == 0:
+                self._idle_close_task = None
+                await self.aclose()
+    
+    @asynccontextmanager
+    async def session(self):
+        """引用计数的浏览器会话
+        
+        浏览器未打开时自动打开；最后一个会话结束后不立即关闭，而是空闲
+        _SESSION_IDLE_CLOSE_DELAY 秒后再关闭，期间的新会话直接复用。
+        通过 open() / async with 显式打开的浏览器仍由 aclose() 关闭。
+        """
+        async with self._session_lock:
+            self._cancel_idle_close()
+            if (self._session_count == 0 and self._persistent_context is not None
+                    and self._persistent_uses >= _PERSISTENT_CONTEXT_MAX_USES):
+                # 持久化上下文使用次数达到上限时重建，配置目录中的登录状态不受影响
+                auto_opened = self._auto_opened
+                await self.aclose()
+                await self.open()
+                self._auto_opened = auto_opened
+            elif self._browser is None and self._persistent_context is None:
+                await self.open()
+                self._auto_opened = True
+            self._session_count += 1
+        try:
+            yield self
+        finally:
+            async with self._session_lock:
+                self._session_count -= 1
+                if self._session_count == 0 and self._auto_opened:
+                    self._idle_close_task = asyncio.create_task(self._close_when_idle())
+    
+    async def extract_cookies_manual(self, output_file="xhs_cookies.json", use_cache=True):
+        """手动登录并提取cookies
+        
+        每次提取使用全新的浏览器上下文，结束时只关闭上下文；
+        未事先 open() 时由 session() 自动启动浏览器，空闲 _SESSION_IDLE_CLOSE_DELAY 秒后关闭。
+        同一 output_file 在 _EXTRACT_CACHE_TTL 秒内重复提取时直接返回上次的结果。
+        """
+        cached = self._extract_cache.get(output_file)
+        if use_cache and cached is not None and time.monotonic() - cached[0] < _EXTRACT_CACHE_TTL:
+            print(f"✅ 使用缓存的cookies: {output_file}")
+            return cached[1]
+        
         print("🍪 小红书Cookie提取工具")
         print("=" * 50)
         print("请按照以下步骤操作：")
         print("1. 浏览器将自动打开小红书网站")
         print("2. 请手动登录你的小红书账号")
-        print("3. 登录成功后，在终端按回车键继续")
+        print("3. 登录成功后自动继续（也可在终端按回车键继续）")
         print("4. 工具将自动提取并保存cookies")
         print("=" * 50)
         
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(headless=False)  # 非无头模式
-            context = await browser.new_context(
-                user_agent=self.user_agent,
-                viewport={'width': 1280, 'height': 900}
-            )
-            page = await context.new_page()
-            
-            # 访问小红书登录页面
-            print("正在打开小红书网站...")
-            await page.goto("https://www.xiaohongshu.com")
-            
-            # 等待用户手动登录
-            input("请在浏览器中完成登录，然后按回车键继续...")
-            
-            # 检查是否已登录
+        # 浏览器由 session() 按引用计数管理，提取结束后空闲一段时间才关闭，期间的再次提取直接复用
+        async with self.session():
+            if self._persistent_context is not None:
+                context = self._persistent_context
+                self._persistent_uses += 1
+            else:
+                context = await self._browser.new_context(
+                    user_agent=self.user_agent,
+                    viewport={'width': 1280, 'height': 900}
+                )
+            page = None
             try:
-                # 等待页面加载完成
-                await page.wait_for_timeout(2000)
+                page = await context.new_page()
                 
-                # 检查当前URL和页面内容
-                current_url = page.url
-                print(f"当前页面URL: {current_url}")
+                # 访问小红书登录页面
+                print("正在打开小红书网站...")
+                await page.goto("https://www.xiaohongshu.com")
                 
-                # 提取所有cookies
-                cookies = await context.cookies()
+                # 等待用户手动登录：由响应事件驱动，不做轮询。
+                # 访客也会拿到 web_session，且访客的值会被后续请求（如 activate）轮换，
+                # 因此 web_session 变化只作为线索；之后的 XHR 响应到达时再检查页面，
+                # 页面上不再有可见的登录按钮才视为登录成功
+                guest_session = next(
+                    (cookie['value'] for cookie in await context.cookies() if cookie['name'] == 'web_session'),
+                    None
+                )
+                session_changed = False
+                checking_login = False
+                logged_in = asyncio.Event()
                 
-                if cookies:
-                    # 过滤重要的cookies
-                    important_cookies = []
-                    important_names = ['web_session', 'a1', 'webId', 'xsecappid', 'websectiga', 'sec_poison_id']
-                    
-                    for cookie in cookies:
-                        if any(name in cookie['name'] for name in important_names) or cookie['name'] in important_names:
-                            important_cookies.append(cookie)
-                    
-                    # 保存完整cookies
-                    full_output = output_file
-                    with open(full_output, 'w', encoding='utf-8') as f:
-                        json.dump(cookies, f, indent=2, ensure_ascii=False)
+                async def on_response(response):
+                    nonlocal guest_session, session_changed, checking_login
+                    if logged_in.is_set():
+                        return
+                    try:
+                        set_cookie = await response.header_value("set-cookie")
+                    except Exception:
+                        # 页面关闭等情况下响应已失效
+                        return
+                    if set_cookie:
+                        for session in _WEB_SESSION_SET_COOKIE_RE.findall(set_cookie):
+                            if session and session != guest_session:
+                                guest_session = session
+                                session_changed = True
                     
-                    # 保存重要cookies
-                    important_output = output_file.replace('.json', '_important.json')
-                    with open(important_output, 'w', encoding='utf-8') as f:
-                        json.dump(important_cookies, f, indent=2, ensure_ascii=False)
+                    # 同一时间只做一次页面检查，且只由 XHR/fetch 响应触发
+                    if not session_changed or checking_login:
+                        return
+                    if response.request.resource_type not in _LOGIN_CHECK_RESOURCE_TYPES:
+                        return
+                    checking_login = True
+                    try:
+                        login_state = await page.evaluate(_LOGIN_STATE_JS)
+                    except Exception:
+                        # 页面跳转中，等下一个响应再检查
+                        return
+                    finally:
+                        checking_login = False
+                    if not login_state["hasLoginButton"]:
+                        logged_in.set()
+                
+                context.on("response", on_response)
+                login_task = asyncio.ensure_future(logged_in.wait())
+                enter_future = _wait_for_enter("请在浏览器中完成登录（检测到登录后自动继续，也可按回车键继续）...")
+                try:
+                    done, _ = await asyncio.wait(
+                        {login_task, enter_future},
+                        timeout=_LOGIN_WAIT_TIMEOUT,
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    context.remove_listener("response", on_response)
+                    login_task.cancel()
+                    enter_future.cancel()
+                if login_task in done:
+                    print("\n✅ 检测到登录成功")
+                elif not done:
+                    print(f"⚠️ 等待登录超过 {_LOGIN_WAIT_TIMEOUT} 秒，按当前状态提取cookies")
+                
+                # 检查是否已登录
+                try:
+                    # 等待登录后的跳转加载完成
+                    await page.wait_for_load_state()
                     
-                    print(f"✅ 成功提取到 {len(cookies)} 个cookies")
-                    print(f"✅ 完整cookies保存到: {full_output}")
-                    print(f"✅ 重要cookies保存到: {important_output}")
+                    # 检查当前URL和页面内容
+                    current_url = page.url
+                    print(f"当前页面URL: {current_url}")
                     
-                    # 显示重要cookies信息
-                    print("\n🔑 重要cookies信息:")
-                    for cookie in important_cookies:
-                        print(f"  - {cookie['name']}: {cookie['value'][:20]}...")
+                    # 提取所有cookies
+                    cookies = await context.cookies()
                     
-                    return cookies
-                else:
-                    print("❌ 未能获取到cookies，请确保已正确登录")
+                    if cookies:
+                        # 过滤重要的cookies：名称包含任一重要名称即保留（子串匹配已涵盖完全相等）
+                        # 先取出名称列，只对名称做判断，再按判断结果从原列表中挑出对应的cookie
+                        names = [cookie['name'] for cookie in cookies]
+                        important_mask = list(map(_is_important_cookie, names))
+                        important_cookies = list(compress(cookies, important_mask))
+                        
+                        # 每个cookie只编码一次，两个文件都由同一批编码结果拼接而成
+                        encoded_cookies = await asyncio.to_thread(_encode_json_items, cookies)
+                        
+                        # 保存完整cookies和重要cookies：两个文件在线程池中并发写入，不阻塞事件循环
+                        full_output = output_file
+                        important_output = output_file.replace('.json', '_important.json')
+                        await asyncio.gather(
+                            asyncio.to_thread(_write_bytes, full_output, _join_json_items(encoded_cookies)),
+                            asyncio.to_thread(
+                                _write_bytes, important_output,
+                                _join_json_items(list(compress(encoded_cookies, important_mask)))
+                            )
+                        )
+                        
+                        self._extract_cache[output_file] = (time.monotonic(), cookies)
+                        
+                        print(f"✅ 成功提取到 {len(cookies)} 个cookies")
+                        print(f"✅ 完整cookies保存到: {full_output}")
+                        print(f"✅ 重要cookies保存到: {important_output}")
+                        
+                        # 显示重要cookies信息：拼成一段文本后一次写出
+                        preview = "".join(
+                            f"  - {cookie['name']}: {cookie['value'][:20]}...\n" for cookie in important_cookies
+                        )
+                        sys.stdout.write(f"\n🔑 重要cookies信息:\n{preview}")
+                        
+                        return cookies
+                    else:
+                        print("❌ 未能获取到cookies，请确保已正确登录")
+                        return None
+                        
+                except Exception as e:
+                    print(f"❌ 提取cookies时出错: {e}")
                     return None
-                    
-            except Exception as e:
-                print(f"❌ 提取cookies时出错: {e}")
-                return None
             finally:
-                await browser.close()
+                if context is self._persistent_context:
+                    # 持久化上下文保留到 aclose()，只关闭本次打开的页面
+                    if page is not None:
+                        await page.close()
+                else:
+                    await context.close()
     
     def validate_cookies(self, cookie_file):
         """验证cookies文件格式"""
         try:
-            with open(cookie_file, 'r', encoding='utf-8') as f:
-                cookies = json.load(f)
+            cookies = _read_json(cookie_file)
             
             if not isinstance(cookies, list):
                 print("❌ Cookies格式错误：应该是数组格式")
                 return False
             
-            required_fields = ['name', 'value', 'domain']
             for cookie in cookies:
-                if not all(field in cookie for field in required_fields):
+                if not (isinstance(cookie, dict) and _REQUIRED_COOKIE_FIELDS <= cookie.keys()):
                     print(f"❌ Cookie缺少必要字段: {cookie}")
                     return False
             
@@ -827,33 +1402,16 @@ class XHSCookieExtractor:
         except Exception as e:
             print(f"❌ 验证cookies文件失败: {e}")
             return False
-
-async def check_cookies_validity(self, page):
-    """检查cookies是否仍然有效"""
-    try:
-        # 访问需要登录的页面
-        await page.goto("https://www.xiaohongshu.com/user/profile/xxx")
-        await page.wait_for_timeout(2000)
-        
-        # 检查是否被重定向到登录页面
-        current_url = page.url
-        if "login" in current_url.lower() or "signin" in current_url.lower():
-            self.log("❌ Cookies已失效，需要重新获取", "WARNING")
-            return False
+    
+    async def validate_cookies_async(self, cookie_files):
+        """并发验证多个cookies文件，文件读取和解析放到线程池中执行，不阻塞事件循环
         
-        return True
-    except:
-        return False
-
-async def refresh_cookies_if_needed(self, cookies_path):
-    """如果cookies失效，提示重新获取"""
-    if not await self.check_cookies_validity(page):
-        self.log("🔄 正在尝试重新获取cookies...")
-        # 可以调用cookie提取器
-        extractor = XHSCookieExtractor()
-        new_cookies = await extractor.extract_cookies_manual(cookies_path)
-        return new_cookies
-    return None
+        返回与 cookie_files 顺序一致的验证结果列表。
+        """
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.validate_cookies, cookie_file) for cookie_file in cookie_files)
+        )
+        return list(results)
 
 def main():
     """主函数"""
@@ -884,7 +1442,8 @@ def main():
     # 创建爬取器实例
     scraper = XHSCommentScraper(
         headless=config["headless"], 
-        debug=config["debug"]
+        debug=config["debug"],
+        save_screenshots=config["debug"]  # 调试时保存截图，便于排查页面状态
     )
     
     try:
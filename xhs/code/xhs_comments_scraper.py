@@ -4,20 +4,346 @@ import json
 import time
 import asyncio
 from datetime import datetime
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+# 预编译正则，避免每次调用时重复查找 re 模块缓存
+_NOTE_ID_RE = re.compile(r"/item/([a-z0-9]+)")
+_LOGIN_URL_RE = re.compile(r"login|signin|register")
+# 调试日志中显示预览的重要cookie
+_IMPORTANT_COOKIES = frozenset({'web_session', 'a1', 'webId', 'xsecappid'})
+# 已解析并校验过的cookies：文件路径 -> (修改时间, cookies)；每个路径只保留最新一份，
+# 文件被更新后修改时间变化，自动重新解析并替换旧条目
+_COOKIE_CACHE = {}
+# 评论区域出现即可开始处理页面
+_COMMENT_AREA_SELECTOR = '[class*="comment"], [class*="interaction"]'
+
+# 页面结构分析脚本（调试用）
+_ANALYZE_JS = """() => {
+    const bodyText = document.body.textContent;
+    const info = {
+        totalElements: document.getElementsByTagName('*').length,
+        commentKeywords: [],
+        possibleCommentContainers: [],
+        textContent: bodyText.length,
+        hasLoginButton: false,
+        hasCommentSection: false,
+        pageContent: bodyText.substring(0, 500)
+    };
+
+    // 按文档顺序遍历一次所有节点，拼出整份文档的文本，并记录每个元素的文本在其中的起止位置。
+    // 元素的 textContent 恰好是这段区间，不必再为每个元素重新拼接整棵子树的文本
+    const textParts = [];
+    const lowerParts = [];
+    const elements = [];
+    let offset = 0;
+    const walk = node => {
+        for (let child = node.firstChild; child !== null; child = child.nextSibling) {
+            if (child.nodeType === Node.TEXT_NODE || child.nodeType === Node.CDATA_SECTION_NODE) {
+                const data = child.data;
+                let lower = data.toLowerCase();
+                if (lower.length !== data.length) {
+                    // 个别字符（如 'İ'）转小写后长度改变，逐字符转换并保留这些字符，使位置保持对齐
+                    lower = Array.from(data, ch => {
+                        const lowerCh = ch.toLowerCase();
+                        return lowerCh.length === ch.length ? lowerCh : ch;
+                    }).join('');
+                }
+                textParts.push(data);
+                lowerParts.push(lower);
+                offset += data.length;
+            } else if (child.nodeType === Node.ELEMENT_NODE) {
+                const entry = {el: child, start: offset, end: offset};
+                elements.push(entry);
+                walk(child);
+                entry.end = offset;
+            }
+        }
+    };
+    const root = document.documentElement;
+    const rootEntry = {el: root, start: 0, end: 0};
+    elements.push(rootEntry);
+    walk(root);
+    rootEntry.end = offset;
+    const docText = textParts.join('');
+    const docLower = lowerParts.join('');
+
+    // 关键词在整份文档中的所有出现位置（含重叠），元素包含该关键词当且仅当某次出现完全落在元素区间内
+    const occurrences = needle => {
+        const positions = [];
+        for (let pos = docLower.indexOf(needle); pos !== -1; pos = docLower.indexOf(needle, pos + 1)) {
+            positions.push(pos);
+        }
+        return positions;
+    };
+    const containsNeedle = (positions, length, start, end) => {
+        // 二分查找第一个不早于 start 的出现位置；它放不下时，更靠后的出现也放不下
+        let lo = 0;
+        let hi = positions.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (positions[mid] < start) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo < positions.length && positions[lo] + length <= end;
+    };
+
+    // 评论关键词：只统计文档中出现过的关键词
+    for (const keyword of ['评论', 'comment', '回复', 'reply', '点赞', 'like']) {
+        const needle = keyword.toLowerCase();
+        const positions = occurrences(needle);
+        if (positions.length === 0) {
+            continue;
+        }
+        const bucket = {keyword: keyword, count: 0, samples: []};
+        for (const {el, start, end} of elements) {
+            if (containsNeedle(positions, needle.length, start, end)) {
+                if (bucket.count < 3) {
+                    bucket.samples.push({
+                        tagName: el.tagName,
+                        className: el.className,
+                        textContent: docText.substring(start, Math.min(end, start + 100))
+                    });
+                }
+                bucket.count++;
+            }
+        }
+        info.commentKeywords.push(bucket);
+    }
+
+    // 可能的评论容器
+    const containerBuckets = [
+        '[class*="comment"]', '[id*="comment"]',
+        '[class*="Comment"]', '[id*="Comment"]',
+        'section', 'div[class*="list"]',
+        '[data-testid*="comment"]',
+        '[class*="interaction"]', '[class*="note-detail"]'
+    ].map(selector => ({selector: selector, count: 0, samples: []}));
+    for (const {el, start, end} of elements) {
+        for (const bucket of containerBuckets) {
+            if (el.matches(bucket.selector)) {
+                if (bucket.count < 2) {
+                    bucket.samples.push({
+                        tagName: el.tagName,
+                        className: el.className,
+                        id: el.id,
+                        textLength: end - start
+                    });
+                }
+                bucket.count++;
+            }
+        }
+    }
+    info.possibleCommentContainers = containerBuckets.filter(bucket => bucket.count > 0);
+
+    // 登录关键词：<html> 的文本包含整份文档，任一元素包含登录关键词时它也包含
+    info.hasLoginButton = ['登录', 'login', '登陆', 'sign in', '请登录'].some(needle => docLower.indexOf(needle) !== -1);
+
+    // 检查是否有评论区域
+    info.hasCommentSection = document.querySelector('[class*="comment"], [id*="comment"]') !== null;
+
+    return info;
+}"""
+
+# 登录状态检查脚本：命中任一未登录迹象即返回原因，都未命中时返回 null；
+# 页面文本只在浏览器内检查，不必传回 Python
+_LOGIN_STATE_JS = """() => {
+    // 页面中出现"登录"/"注册"文字（"请登录"、"立即登录"按钮都包含在内）
+    if (/登录|注册/.test(document.body.textContent)) {
+        return '登录/注册文字';
+    }
+    // 优先使用浏览器原生的 checkVisibility；旧版浏览器退回与 Playwright 的 is_visible 一致的判断：
+    // 包围盒非空且未设置 visibility: hidden
+    const isVisible = el => {
+        if (el.checkVisibility) {
+            return el.checkVisibility({visibilityProperty: true});
+        }
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+    for (const el of document.querySelectorAll('[data-testid*="login"], [class*="login"]')) {
+        if (isVisible(el)) {
+            return '登录按钮';
+        }
+    }
+    return null;
+}"""
+
+# 登录检查与页面结构分析合并为一个脚本，一次 evaluate 返回两者的结果；
+# 页面结构分析只用于调试日志，非调试模式下跳过
+_PAGE_STATE_JS = f"""(debug) => ({{
+    loginReason: ({_LOGIN_STATE_JS})(),
+    title: document.title,
+    readyState: document.readyState,
+    analysis: debug ? ({_ANALYZE_JS})() : null
+}})"""
+
+# 滚动时尝试点击的"加载更多"按钮文字，按优先级排列
+_LOAD_MORE_TEXTS = (
+    "展开更多评论", "查看全部评论", "加载更多", "更多评论",
+    "展开", "更多", "查看更多", "点击查看全部评论", "显示更多评论"
+)
+
+# 滚动加载脚本：滚动、点击"加载更多"、判断页面高度是否稳定的整个循环都在浏览器内执行，
+# 返回每一轮的记录供日志输出
+_SCROLL_AND_LOAD_JS = """async ({maxRounds, sleepMs, clickWaitMs, texts, storageKey}) => {
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+    // 优先使用浏览器原生的 checkVisibility；旧版浏览器退回与 Playwright 的 is_visible 一致的判断：
+    // 包围盒非空且未设置 visibility: hidden
+    const isVisible = el => {
+        if (el.checkVisibility) {
+            return el.checkVisibility({visibilityProperty: true});
+        }
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+    // 与 text= 选择器一样按子串匹配：一次查询取出包含任一按钮文字的文本节点，
+    // 再取优先级最高的文字中文档顺序第一个可见的元素
+    const buttonXPath = '//body//text()[' +
+        texts.map(text => 'contains(., ' + JSON.stringify(text) + ')').join(' or ') + ']';
+    const findButton = () => {
+        const nodes = document.evaluate(
+            buttonXPath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+        );
+        let best = null;
+        let bestIndex = texts.length;
+        for (let i = 0; i < nodes.snapshotLength && bestIndex > 0; i++) {
+            const node = nodes.snapshotItem(i);
+            const index = texts.findIndex(text => node.data.includes(text));
+            if (index !== -1 && index < bestIndex && node.parentElement !== null && isVisible(node.parentElement)) {
+                best = node.parentElement;
+                bestIndex = index;
+            }
+        }
+        return best === null ? null : {button: best, text: texts[bestIndex]};
+    };
+
+    // 每轮记录同步写入 sessionStorage：点击的元素若触发页面跳转，本次 evaluate 会失败，
+    // 跳转后仍可从 sessionStorage 取回已完成的各轮记录；pending 为点击前写入的本轮记录
+    const saveRounds = (pending) => {
+        try {
+            sessionStorage.setItem(storageKey, JSON.stringify(pending ? rounds.concat([pending]) : rounds));
+        } catch (e) {}
+    };
+
+    const rounds = [];
+    let lastHeight = 0;
+    let stableRounds = 0;
+    for (let i = 0; i < maxRounds; i++) {
+        // 滚动到页面底部
+        const height = document.body.scrollHeight;
+        window.scrollTo(0, height);
+        await sleep(sleepMs);
+
+        // 尝试点击各种"加载更多"按钮，点中优先级最高的一个
+        let clicked = null;
+        let error = null;
+        try {
+            const found = findButton();
+            if (found !== null) {
+                saveRounds({height, newHeight: null, clicked: found.text, error: '点击后页面发生跳转', stableRounds: 0});
+                found.button.click();
+                clicked = found.text;
+                await sleep(clickWaitMs);
+            }
+        } catch (e) {
+            error = `点击"加载更多"按钮失败: ${e.message}`;
+        }
+
+        // 检查页面高度变化，连续3轮无变化就停止
+        const newHeight = document.body.scrollHeight;
+        if (newHeight === height && height === lastHeight) {
+            stableRounds++;
+        } else {
+            stableRounds = 0;
+            lastHeight = newHeight;
+        }
+        rounds.push({height, newHeight, clicked, error, stableRounds});
+        saveRounds(null);
+        if (stableRounds >= 3) {
+            break;
+        }
+    }
+    try {
+        sessionStorage.removeItem(storageKey);
+    } catch (e) {}
+    return rounds;
+}"""
+
+# 保存滚动记录的 sessionStorage 键
+_SCROLL_ROUNDS_STORAGE_KEY = "__xhsScrollRounds"
+
+# 取出并清除 sessionStorage 中保存的滚动记录
+_TAKE_SCROLL_ROUNDS_JS = """(key) => {
+    try {
+        const value = sessionStorage.getItem(key);
+        sessionStorage.removeItem(key);
+        return value;
+    } catch (e) {
+        return null;
+    }
+}"""
+
+# 拦截的资源类型：评论提取只依赖 DOM 文本；样式表保留，滚动高度和元素可见性判断依赖布局
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+
+async def _block_media_route(route):
+    """丢弃图片、视频和字体请求，其余请求照常发送"""
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+def _write_comments_json(path, fields_before, comments, fields_after):
+    """逐条写出评论结果 JSON，输出与 json.dump(..., ensure_ascii=False, indent=2) 完全相同
+    
+    不再组装包含全部评论的结果字典，每次只编码一条评论，评论很多时内存占用不随总量增长。
+    fields_before / fields_after 为 "comments" 前后的 (键, 值) 序列，值须为标量。
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for key, value in fields_before:
+            f.write(f"\n  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},")
+        f.write('\n  "comments": [')
+        for index, comment in enumerate(comments):
+            # 每条评论位于第二层缩进，编码结果中的换行都是结构换行，直接补缩进
+            f.write(",\n    " if index else "\n    ")
+            f.write(json.dumps(comment, ensure_ascii=False, indent=2).replace("\n", "\n    "))
+        f.write("\n  ]" if comments else "]")
+        for key, value in fields_after:
+            f.write(f",\n  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}")
+        f.write("\n}")
 
 class XHSCommentScraper:
     """小红书评论爬取器"""
     
-    def __init__(self, headless=True, timeout=30, debug=True):
+    def __init__(self, headless=True, timeout=30, debug=True, profile_dir=None, block_media=True,
+                 navigation_timeout=5):
         self.headless = headless
         self.timeout = timeout
+        # 导航超时（秒）：只等到服务器开始返回页面，超时后不放弃，继续等待评论区域
+        self.navigation_timeout = navigation_timeout
         self.debug = debug
+        # 只需要页面文本，默认拦截图片、视频和字体请求
+        self.block_media = block_media
+        # 指定 profile_dir 时使用持久化的浏览器配置目录，cookies 和 localStorage 保存在磁盘上，
+        # 下次运行无需重新导入cookies
+        self.profile_dir = profile_dir
         self.user_agent = (
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
             "AppleWebKit/537.36 (KHTML, like Gecko) "
             "Chrome/124.0.0.0 Safari/537.36"
         )
+        # 浏览器在多次爬取间复用，由 open() / close() 管理
+        self._playwright = None
+        self._browser = None
+        # 持久化模式下整个浏览器只有这一个上下文，所有页面共用
+        self._persistent_context = None
+        # 已导入持久化上下文的cookies文件，同一文件只导入一次
+        self._persistent_cookies_path = None
     
     def log(self, message, level="INFO"):
         """调试日志输出"""
@@ -27,7 +353,7 @@ class XHSCommentScraper:
     
     def extract_note_id(self, url: str) -> str | None:
         """从URL中提取笔记ID"""
-        match = re.search(r"/item/([a-z0-9]+)", url)
+        match = _NOTE_ID_RE.search(url)
         note_id = match.group(1) if match else None
         self.log(f"提取笔记ID: {note_id}")
         return note_id
@@ -38,9 +364,17 @@ class XHSCommentScraper:
             self.log("未提供cookies文件路径")
             return None
             
-        if not os.path.exists(cookie_path):
+        try:
+            mtime_ns = os.stat(cookie_path).st_mtime_ns
+        except OSError:
             self.log(f"Cookies文件不存在: {cookie_path}")
             return None
+        
+        cached = _COOKIE_CACHE.get(cookie_path)
+        if cached is not None and cached[0] == mtime_ns:
+            self.log(f"使用已加载的 {len(cached[1])} 个有效cookies")
+            # 返回副本，调用方修改结果不会影响缓存
+            return [dict(cookie) for cookie in cached[1]]
             
         try:
             with open(cookie_path, "r", encoding="utf-8") as f:
@@ -83,59 +417,68 @@ class XHSCommentScraper:
             self.log(f"成功加载 {len(valid_cookies)} 个有效cookies")
             
             # 显示重要cookies信息
-            important_names = ['web_session', 'a1', 'webId', 'xsecappid']
             for cookie in valid_cookies:
-                if cookie['name'] in important_names:
+                if cookie['name'] in _IMPORTANT_COOKIES:
                     value_preview = cookie['value'][:20] + "..." if len(cookie['value']) > 20 else cookie['value']
                     self.log(f"  - {cookie['name']}: {value_preview}")
             
+            _COOKIE_CACHE[cookie_path] = (mtime_ns, [dict(cookie) for cookie in valid_cookies])
             return valid_cookies
             
         except Exception as e:
             self.log(f"加载cookies失败: {e}", "ERROR")
             return None
     
+    def _report_login_state(self, current_url, reason):
+        """根据当前URL和页面检查结果输出登录状态日志，返回是否已登录"""
+        # 当前URL本地即可判断
+        if _LOGIN_URL_RE.search(current_url.lower()):
+            reason = "登录页面"
+        
+        if reason:
+            self.log("❌ 检测到未登录状态", "WARNING")
+            self.log(f"   当前URL: {current_url}")
+            self.log(f"   检测依据: {reason}")
+            return False
+        else:
+            self.log("✅ 已登录状态")
+            return True
+    
+    def _report_page_structure(self, title, url, ready_state, analysis):
+        """输出页面结构分析结果"""
+        self.log(f"页面标题: {title}")
+        self.log(f"当前URL: {url}")
+        self.log(f"页面加载状态: {ready_state}")
+        
+        self.log(f"页面总元素数: {analysis['totalElements']}")
+        self.log(f"页面文本长度: {analysis['textContent']}")
+        self.log(f"是否检测到登录按钮: {analysis['hasLoginButton']}")
+        self.log(f"是否检测到评论区域: {analysis['hasCommentSection']}")
+        
+        # 显示页面内容预览
+        self.log(f"页面内容预览: {analysis.get('pageContent', '')[:200]}...")
+        
+        self.log("评论关键词分析:")
+        for item in analysis['commentKeywords']:
+            self.log(f"  - '{item['keyword']}': {item['count']} 个元素")
+            for sample in item['samples']:
+                self.log(f"    * {sample['tagName']}.{sample['className']}: {sample['textContent'][:50]}...")
+        
+        self.log("可能的评论容器:")
+        for container in analysis['possibleCommentContainers']:
+            self.log(f"  - {container['selector']}: {container['count']} 个元素")
+            for sample in container['samples']:
+                self.log(f"    * {sample['tagName']}.{sample['className']} (文本长度: {sample['textLength']})")
+    
     async def check_login_status(self, page):
         """检查登录状态"""
         self.log("检查登录状态...")
         
         try:
-            # 等待页面加载
-            await page.wait_for_timeout(2000)
-            
-            # 检查是否有登录相关的元素
-            login_indicators = [
-                "text=登录", "text=注册", "text=立即登录",
-                "[data-testid*='login']", "[class*='login']"
-            ]
-            
-            has_login_button = False
-            for indicator in login_indicators:
-                try:
-                    element = await page.query_selector(indicator)
-                    if element and await element.is_visible():
-                        has_login_button = True
-                        break
-                except:
-                    continue
-            
-            # 检查当前URL
             current_url = page.url
-            is_login_page = any(keyword in current_url.lower() for keyword in ['login', 'signin', 'register'])
-            
-            # 检查页面内容
-            page_text = await page.evaluate("document.body.textContent")
-            has_login_text = any(keyword in page_text for keyword in ['请登录', '登录', '注册'])
-            
-            if has_login_button or is_login_page or has_login_text:
-                self.log("❌ 检测到未登录状态", "WARNING")
-                self.log(f"   当前URL: {current_url}")
-                self.log(f"   登录按钮: {has_login_button}")
-                self.log(f"   登录页面: {is_login_page}")
-                return False
-            else:
-                self.log("✅ 已登录状态")
-                return True
+            # 是登录页时无需再检查页面；否则检查页面内容和登录相关的元素，一次 evaluate 完成
+            reason = None if _LOGIN_URL_RE.search(current_url.lower()) else await page.evaluate(_LOGIN_STATE_JS)
+            return self._report_login_state(current_url, reason)
                 
         except Exception as e:
             self.log(f"检查登录状态时出错: {e}", "ERROR")
@@ -145,180 +488,87 @@ class XHSCommentScraper:
         """分析页面结构，帮助调试"""
         self.log("开始分析页面结构...")
         
-        # 获取页面基本信息
-        title = await page.title()
-        url = page.url
-        self.log(f"页面标题: {title}")
-        self.log(f"当前URL: {url}")
-        
-        # 检查页面是否完全加载
-        ready_state = await page.evaluate("document.readyState")
-        self.log(f"页面加载状态: {ready_state}")
-        
-        # 分析页面中包含"评论"相关的元素
-        analysis_js = """
-        (() => {
-            const info = {
-                totalElements: document.querySelectorAll('*').length,
-                commentKeywords: [],
-                possibleCommentContainers: [],
-                textContent: document.body.textContent.length,
-                hasLoginButton: false,
-                hasCommentSection: false,
-                pageContent: document.body.textContent.substring(0, 500)
-            };
-            
-            // 查找包含评论关键词的元素
-            const keywords = ['评论', 'comment', '回复', 'reply', '点赞', 'like'];
-            keywords.forEach(keyword => {
-                const elements = Array.from(document.querySelectorAll('*')).filter(el => {
-                    return el.textContent && el.textContent.toLowerCase().includes(keyword.toLowerCase());
-                });
-                if (elements.length > 0) {
-                    info.commentKeywords.push({
-                        keyword: keyword,
-                        count: elements.length,
-                        samples: elements.slice(0, 3).map(el => ({
-                            tagName: el.tagName,
-                            className: el.className,
-                            textContent: el.textContent.substring(0, 100)
-                        }))
-                    });
-                }
-            });
-            
-            // 查找可能的评论容器
-            const containerSelectors = [
-                '[class*="comment"]', '[id*="comment"]',
-                '[class*="Comment"]', '[id*="Comment"]',
-                'section', 'div[class*="list"]',
-                '[data-testid*="comment"]',
-                '[class*="interaction"]', '[class*="note-detail"]'
-            ];
-            
-            containerSelectors.forEach(selector => {
-                try {
-                    const elements = document.querySelectorAll(selector);
-                    if (elements.length > 0) {
-                        info.possibleCommentContainers.push({
-                            selector: selector,
-                            count: elements.length,
-                            samples: Array.from(elements).slice(0, 2).map(el => ({
-                                tagName: el.tagName,
-                                className: el.className,
-                                id: el.id,
-                                textLength: el.textContent ? el.textContent.length : 0
-                            }))
-                        });
-                    }
-                } catch (e) {}
-            });
-            
-            // 检查是否有登录相关元素
-            const loginKeywords = ['登录', 'login', '登陆', 'sign in', '请登录'];
-            loginKeywords.forEach(keyword => {
-                const loginElements = Array.from(document.querySelectorAll('*')).filter(el => {
-                    return el.textContent && el.textContent.toLowerCase().includes(keyword.toLowerCase());
-                });
-                if (loginElements.length > 0) {
-                    info.hasLoginButton = true;
-                }
-            });
-            
-            // 检查是否有评论区域
-            const commentSections = document.querySelectorAll('[class*="comment"], [id*="comment"]');
-            info.hasCommentSection = commentSections.length > 0;
-            
-            return info;
-        })();
-        """
-        
         try:
-            analysis = await page.evaluate(analysis_js)
-            
-            self.log(f"页面总元素数: {analysis['totalElements']}")
-            self.log(f"页面文本长度: {analysis['textContent']}")
-            self.log(f"是否检测到登录按钮: {analysis['hasLoginButton']}")
-            self.log(f"是否检测到评论区域: {analysis['hasCommentSection']}")
-            
-            # 显示页面内容预览
-            self.log(f"页面内容预览: {analysis.get('pageContent', '')[:200]}...")
-            
-            self.log("评论关键词分析:")
-            for item in analysis['commentKeywords']:
-                self.log(f"  - '{item['keyword']}': {item['count']} 个元素")
-                for sample in item['samples']:
-                    self.log(f"    * {sample['tagName']}.{sample['className']}: {sample['textContent'][:50]}...")
-            
-            self.log("可能的评论容器:")
-            for container in analysis['possibleCommentContainers']:
-                self.log(f"  - {container['selector']}: {container['count']} 个元素")
-                for sample in container['samples']:
-                    self.log(f"    * {sample['tagName']}.{sample['className']} (文本长度: {sample['textLength']})")
-            
-            return analysis
+            state = await page.evaluate(_PAGE_STATE_JS, True)
+            self._report_page_structure(state['title'], page.url, state['readyState'], state['analysis'])
+            return state['analysis']
             
         except Exception as e:
             self.log(f"页面结构分析失败: {e}", "ERROR")
             return None
     
+    async def inspect_page(self, page):
+        """检查登录状态，调试模式下同时分析页面结构；两者在同一次 evaluate 中完成
+        
+        返回是否已登录。
+        """
+        self.log("检查登录状态...")
+        
+        try:
+            state = await page.evaluate(_PAGE_STATE_JS, self.debug)
+        except Exception as e:
+            self.log(f"检查登录状态时出错: {e}", "ERROR")
+            return False
+        
+        current_url = page.url
+        if state['analysis'] is not None:
+            self.log("开始分析页面结构...")
+            self._report_page_structure(state['title'], current_url, state['readyState'], state['analysis'])
+        return self._report_login_state(current_url, state['loginReason'])
+    
     async def scroll_and_load_comments(self, page, max_rounds=30, sleep_sec=2.0):
-        """滚动页面并加载更多评论"""
+        """滚动页面并加载更多评论
+        
+        整个滚动循环在浏览器内完成，只需一次 evaluate 往返；各轮的结果在结束后统一输出到日志。
+        点击的按钮触发页面跳转时，取回跳转前已完成的记录，在新页面上继续剩余轮次。
+        """
         self.log("开始滚动加载评论...")
-        last_height = 0
-        stable_rounds = 0
         
-        for round_num in range(max_rounds):
-            self.log(f"第 {round_num + 1}/{max_rounds} 轮滚动")
-            
-            # 获取当前页面高度
-            curr_height = await page.evaluate("document.body.scrollHeight")
-            self.log(f"当前页面高度: {curr_height}")
-            
-            # 滚动到页面底部
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await page.wait_for_timeout(int(sleep_sec * 1000))
-            
-            # 尝试点击各种"加载更多"按钮
-            load_more_texts = [
-                "展开更多评论", "查看全部评论", "加载更多", "更多评论", 
-                "展开", "更多", "查看更多", "点击查看全部评论", "显示更多评论"
-            ]
-            
-            clicked_button = False
-            for text in load_more_texts:
-                try:
-                    # 查找并点击按钮
-                    buttons = await page.query_selector_all(f"text={text}")
-                    for button in buttons:
-                        if await button.is_visible():
-                            await button.click(timeout=2000)
-                            self.log(f"点击了'{text}'按钮")
-                            await page.wait_for_timeout(1000)
-                            clicked_button = True
-                            break
-                    if clicked_button:
-                        break
-                except Exception as e:
-                    self.log(f"点击'{text}'按钮失败: {e}", "DEBUG")
-                    continue
-            
-            # 检查页面高度变化
-            new_height = await page.evaluate("document.body.scrollHeight")
-            self.log(f"滚动后页面高度: {new_height}")
-            
-            if new_height == curr_height == last_height:
-                stable_rounds += 1
-                self.log(f"页面高度无变化 (连续 {stable_rounds} 轮)")
-                if stable_rounds >= 3:  # 连续3轮无变化就停止
-                    self.log("页面高度无变化，停止滚动")
+        rounds = []
+        while len(rounds) < max_rounds:
+            try:
+                rounds += await page.evaluate(_SCROLL_AND_LOAD_JS, {
+                    "maxRounds": max_rounds - len(rounds),
+                    "sleepMs": int(sleep_sec * 1000),
+                    "clickWaitMs": 1000,
+                    "texts": _LOAD_MORE_TEXTS,
+                    "storageKey": _SCROLL_ROUNDS_STORAGE_KEY
+                })
+                break
+            except Exception as e:
+                recovered = await self._take_saved_scroll_rounds(page)
+                if not recovered:
+                    self.log(f"滚动加载评论失败: {e}", "ERROR")
+                    self.log("本次 evaluate 中已完成的滚动轮次记录无法取回", "WARNING")
                     break
-            else:
-                stable_rounds = 0
-                last_height = new_height
+                self.log(f"滚动过程中页面发生跳转，已取回 {len(recovered)} 轮记录，继续滚动", "WARNING")
+                rounds += recovered
+        
+        for round_num, record in enumerate(rounds, 1):
+            self.log(f"第 {round_num}/{max_rounds} 轮滚动")
+            self.log(f"当前页面高度: {record['height']}")
+            if record['error']:
+                self.log(record['error'], "DEBUG")
+            if record['clicked']:
+                self.log(f"点击了'{record['clicked']}'按钮")
+            if record['newHeight'] is not None:
+                self.log(f"滚动后页面高度: {record['newHeight']}")
+            if record['stableRounds']:
+                self.log(f"页面高度无变化 (连续 {record['stableRounds']} 轮)")
+                if record['stableRounds'] >= 3:
+                    self.log("页面高度无变化，停止滚动")
         
         self.log("滚动加载完成")
     
+    async def _take_saved_scroll_rounds(self, page):
+        """页面跳转后，从 sessionStorage 取回滚动脚本已保存的各轮记录；取不到时返回 None"""
+        try:
+            await page.wait_for_load_state("domcontentloaded")
+            saved = await page.evaluate(_TAKE_SCROLL_ROUNDS_JS, _SCROLL_ROUNDS_STORAGE_KEY)
+        except Exception:
+            return None
+        return json.loads(saved) if saved else None
+    
     async def extract_comments(self, page):
         """提取评论数据"""
         self.log("开始提取评论数据...")
@@ -326,6 +576,14 @@ class XHSCommentScraper:
         # 增强的JavaScript代码用于提取评论
         js_code = """
         (() => {
+            // 用户名、时间、点赞数所在元素的类名特征，分别对应 [class*="user"] 等属性选择器
+            const USER_CLASS_RE = /user|name|author|nick/;
+            const TIME_CLASS_RE = /time|date/;
+            const LIKE_CLASS_RE = /like|heart|thumb/;
+            // 需要过滤的文本：整段等于按钮文字，或包含"展开更多"等提示文字
+            const SKIP_TEXTS = new Set(['评论', '点赞', '回复']);
+            const SKIP_TEXT_RE = /展开更多|查看全部|登录|注册/;
+            
             const debugInfo = {
                 searchResults: [],
                 finalComments: [],
@@ -375,6 +633,8 @@ class XHSCommentScraper:
             // 如果没找到特定选择器，尝试通过文本特征查找
             if (commentElements.length === 0) {
                 console.log('使用文本特征查找评论...');
+                // 所有文本特征合并为一个正则，每个元素只扫描一次文本
+                const FEATURE_RE = /回复|点赞|❤️|👍|分钟前|小时前|天前|刚刚/;
                 const allElements = document.querySelectorAll('div, section, article, span, p');
                 const candidateElements = Array.from(allElements).filter(el => {
                     const text = el.textContent || '';
@@ -383,11 +643,7 @@ class XHSCommentScraper:
                     // 更宽泛的匹配条件
                     return (
                         text.length > 5 && text.length < 2000 && // 合理的评论长度范围
-                        (className.toLowerCase().includes('comment') ||
-                         text.includes('回复') || text.includes('点赞') ||
-                         text.includes('❤️') || text.includes('👍') ||
-                         text.includes('分钟前') || text.includes('小时前') ||
-                         text.includes('天前') || text.includes('刚刚'))
+                        (className.toLowerCase().includes('comment') || FEATURE_RE.test(text))
                     );
                 });
                 
@@ -411,44 +667,44 @@ class XHSCommentScraper:
                     const textContent = element.textContent?.trim() || '';
                     
                     // 过滤条件更加宽松
-                    if (textContent.length < 2 || 
-                        textContent.includes('展开更多') ||
-                        textContent.includes('查看全部') ||
-                        textContent === '评论' ||
-                        textContent === '点赞' ||
-                        textContent === '回复' ||
-                        textContent.includes('登录') ||
-                        textContent.includes('注册')) {
+                    if (textContent.length < 2 || SKIP_TEXTS.has(textContent) || SKIP_TEXT_RE.test(textContent)) {
                         return;
                     }
                     
-                    // 尝试提取用户名
+                    // 按文档顺序遍历一次子元素，同时查找用户名、时间和点赞数，三者都找到即停止：
+                    // 用户名、时间取第一个匹配的元素，点赞数取第一个包含数字的匹配元素
                     let username = '';
-                    const userSelectors = '[class*="user"], [class*="name"], [class*="author"], [class*="nick"]';
-                    const userElements = element.querySelectorAll(userSelectors);
-                    if (userElements.length > 0) {
-                        username = userElements[0].textContent?.trim() || '';
-                    }
-                    
-                    // 尝试提取时间
                     let timestamp = '';
-                    const timeSelectors = '[class*="time"], time, [datetime], [class*="date"]';
-                    const timeElements = element.querySelectorAll(timeSelectors);
-                    if (timeElements.length > 0) {
-                        timestamp = timeElements[0].textContent?.trim() || 
-                                   timeElements[0].getAttribute('datetime') || '';
-                    }
-                    
-                    // 尝试提取点赞数
                     let likeCount = 0;
-                    const likeSelectors = '[class*="like"], [class*="heart"], [class*="thumb"]';
-                    const likeElements = element.querySelectorAll(likeSelectors);
-                    for (const likeEl of likeElements) {
-                        const likeText = likeEl.textContent?.trim() || '';
-                        const match = likeText.match(/\d+/);
-                        if (match) {
-                            likeCount = parseInt(match[0]);
-                            break;
+                    let userFound = false;
+                    let timeFound = false;
+                    let likeFound = false;
+                    const descendants = element.getElementsByTagName('*');
+                    for (let i = 0; i < descendants.length && !(userFound && timeFound && likeFound); i++) {
+                        const child = descendants[i];
+                        const childClass = child.getAttribute('class') || '';
+                        
+                        // 尝试提取用户名
+                        if (!userFound && USER_CLASS_RE.test(childClass)) {
+                            userFound = true;
+                            username = child.textContent?.trim() || '';
+                        }
+                        
+                        // 尝试提取时间
+                        if (!timeFound && (TIME_CLASS_RE.test(childClass) || child.tagName === 'TIME' ||
+                                           child.hasAttribute('datetime'))) {
+                            timeFound = true;
+                            timestamp = child.textContent?.trim() || 
+                                       child.getAttribute('datetime') || '';
+                        }
+                        
+                        // 尝试提取点赞数
+                        if (!likeFound && LIKE_CLASS_RE.test(childClass)) {
+                            const match = (child.textContent?.trim() || '').match(/\d+/);
+                            if (match) {
+                                likeFound = true;
+                                likeCount = parseInt(match[0]);
+                            }
                         }
                     }
                     
@@ -471,13 +727,25 @@ class XHSCommentScraper:
                 }
             });
             
-            // 去重（基于内容）
+            // 去重（基于内容）：对完整内容计算 32 位 FNV-1a 哈希，Set 中只保存数字；
+            // 前缀相同但内容不同的评论不会再被误去重
+            const fnv1a = text => {
+                let hash = 0x811c9dc5;
+                for (let i = 0; i < text.length; i++) {
+                    hash ^= text.charCodeAt(i);
+                    hash = Math.imul(hash, 16777619);
+                }
+                return hash >>> 0;
+            };
             const uniqueComments = [];
             const seenContent = new Set();
             
             for (const comment of comments) {
-                const contentKey = comment.content.substring(0, 30); // 使用前30个字符作为去重依据
-                if (!seenContent.has(contentKey) && comment.content.length > 3) {
+                if (comment.content.length <= 3) {
+                    continue;
+                }
+                const contentKey = fnv1a(comment.content);
+                if (!seenContent.has(contentKey)) {
                     seenContent.add(contentKey);
                     uniqueComments.push(comment);
                 }
@@ -528,119 +796,265 @@ class XHSCommentScraper:
             return []
     
     async def take_screenshot(self, page, filename):
-        """截图保存用于调试"""
+        """截图保存用于调试；仅调试模式下保存，只截取可视区域并编码为 JPEG"""
+        if not self.debug:
+            return
         try:
             screenshot_path = f"/Users/ankanghao/AiProjects/coze_study/xhs/{filename}"
-            await page.screenshot(path=screenshot_path, full_page=True)
+            await page.screenshot(path=screenshot_path, type="jpeg", quality=60, full_page=False)
             self.log(f"截图已保存: {screenshot_path}")
         except Exception as e:
             self.log(f"截图失败: {e}", "ERROR")
     
+    async def open(self):
+        """启动浏览器（指定 profile_dir 时为持久化上下文），之后多次爬取共用；已启动时直接返回"""
+        if self._browser is not None or self._persistent_context is not None:
+            return
+        self.log("正在启动浏览器...")
+        self._playwright = await async_playwright().start()
+        launch_args = ['--no-sandbox', '--disable-blink-features=AutomationControlled']
+        if self.profile_dir:
+            self._persistent_context = await self._playwright.chromium.launch_persistent_context(
+                self.profile_dir,
+                headless=self.headless,
+                args=launch_args,
+                user_agent=self.user_agent,
+                viewport={'width': 1280, 'height': 900},
+                locale='zh-CN'
+            )
+            if self.block_media:
+                await self._persistent_context.route("**/*", _block_media_route)
+        else:
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=launch_args
+            )
+    
+    async def close(self):
+        """关闭浏览器并停止 Playwright"""
+        if self._persistent_context is not None:
+            await self._persistent_context.close()
+            self._persistent_context = None
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        self._persistent_cookies_path = None
+    
+    async def __aenter__(self):
+        await self.open()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def _import_persistent_cookies(self, cookies_path):
+        """把cookies文件导入持久化上下文；同一文件只导入一次，之后由配置目录保存"""
+        if not cookies_path or cookies_path == self._persistent_cookies_path:
+            return
+        cookies = self.load_cookies(cookies_path)
+        if cookies:
+            try:
+                await self._persistent_context.add_cookies(cookies)
+                self._persistent_cookies_path = cookies_path
+                self.log("✅ 已成功导入cookies")
+            except Exception as e:
+                self.log(f"❌ 导入cookies失败: {e}", "ERROR")
+                self.log("   继续尝试无cookies访问...")
+    
+    async def _new_context(self, browser, cookies):
+        """新建浏览器上下文并导入cookies"""
+        context = await browser.new_context(
+            user_agent=self.user_agent,
+            viewport={'width': 1280, 'height': 900},
+            locale='zh-CN'
+        )
+        if self.block_media:
+            await context.route("**/*", _block_media_route)
+        
+        if cookies:
+            try:
+                await context.add_cookies(cookies)
+                self.log("✅ 已成功导入cookies")
+            except Exception as e:
+                self.log(f"❌ 导入cookies失败: {e}", "ERROR")
+                self.log("   继续尝试无cookies访问...")
+        
+        return context
+    
+    async def _scrape_page(self, context, url, max_scrolls):
+        """在给定的上下文中打开一个页面并爬取评论，结束后关闭页面"""
+        page = await context.new_page()
+        try:
+            page.set_default_timeout(self.timeout * 1000)
+            page.set_default_navigation_timeout(self.navigation_timeout * 1000)
+            
+            self.log(f"正在访问页面: {url}")
+            try:
+                await page.goto(url, wait_until="commit")
+            except PlaywrightTimeoutError:
+                # 个别慢页面不拖住整批任务，是否可用由下面的评论区域等待决定
+                self.log(f"页面导航超过 {self.navigation_timeout} 秒，继续等待评论区域", "WARNING")
+            
+            # 等待评论区域出现，而不是固定等待
+            self.log("等待页面加载...")
+            try:
+                await page.wait_for_selector(_COMMENT_AREA_SELECTOR, timeout=self.timeout * 1000)
+            except PlaywrightTimeoutError:
+                self.log("未等到评论区域出现，继续处理当前页面", "WARNING")
+            
+            # 检查登录状态并分析页面结构（调试模式），一次 evaluate 完成
+            is_logged_in = await self.inspect_page(page)
+            if not is_logged_in:
+                self.log("❌ 未检测到登录状态，可能需要有效的cookies", "WARNING")
+            
+            # 截图保存当前状态
+            await self.take_screenshot(page, "page_initial.jpg")
+            
+            # 滚动加载更多评论
+            await self.scroll_and_load_comments(page, max_rounds=max_scrolls)
+            
+            # 截图保存滚动后状态
+            await self.take_screenshot(page, "page_after_scroll.jpg")
+            
+            # 提取评论数据
+            return await self.extract_comments(page)
+        finally:
+            await page.close()
+    
     async def scrape_comments(self, url: str, cookies_path: str = None, max_scrolls: int = 30):
-        """爬取指定URL的评论"""
+        """爬取指定URL的评论
+        
+        在 async with 或 open() 之后调用时复用同一个浏览器；单独调用时爬取结束即关闭浏览器。
+        """
+        owns_browser = self._browser is None and self._persistent_context is None
         try:
-            async with async_playwright() as playwright:
-                self.log("正在启动浏览器...")
-                browser = await playwright.chromium.launch(
-                    headless=self.headless,
-                    args=['--no-sandbox', '--disable-blink-features=AutomationControlled']
-                )
-                
-                context = await browser.new_context(
-                    user_agent=self.user_agent,
-                    viewport={'width': 1280, 'height': 900},
-                    locale='zh-CN'
-                )
+            await self.open()
+            
+            if self._persistent_context is not None:
+                # 持久化上下文随浏览器保留，只关闭本次打开的页面
+                await self._import_persistent_cookies(cookies_path)
+                return await self._scrape_page(self._persistent_context, url, max_scrolls)
+            
+            # 加载cookies
+            context = await self._new_context(self._browser, self.load_cookies(cookies_path))
+            try:
+                return await self._scrape_page(context, url, max_scrolls)
+            finally:
+                await context.close()
                 
-                # 加载cookies
+        except Exception as e:
+            self.log(f"爬取过程中出错: {e}", "ERROR")
+            return []
+        finally:
+            if owns_browser:
+                await self.close()
+    
+    async def scrape_many(self, urls, cookies_path: str = None, max_scrolls: int = 30, concurrency: int = 5):
+        """并发爬取多个URL的评论
+        
+        所有URL共用一个浏览器，每个URL使用独立的上下文（持久化模式下为同一上下文中的独立页面），
+        同时进行的数量不超过 concurrency；cookies只加载一次。
+        返回与 urls 顺序一致的评论列表，单个URL失败时对应位置为空列表。
+        """
+        owns_browser = self._browser is None and self._persistent_context is None
+        semaphore = asyncio.BoundedSemaphore(concurrency)
+        
+        try:
+            await self.open()
+            
+            cookies = None
+            if self._persistent_context is not None:
+                await self._import_persistent_cookies(cookies_path)
+            else:
                 cookies = self.load_cookies(cookies_path)
-                if cookies:
+            
+            async def scrape_one(url):
+                async with semaphore:
                     try:
-                        await context.add_cookies(cookies)
-                        self.log("✅ 已成功导入cookies")
+                        if self._persistent_context is not None:
+                            return await self._scrape_page(self._persistent_context, url, max_scrolls)
+                        context = await self._new_context(self._browser, cookies)
+                        try:
+                            return await self._scrape_page(context, url, max_scrolls)
+                        finally:
+                            await context.close()
                     except Exception as e:
-                        self.log(f"❌ 导入cookies失败: {e}", "ERROR")
-                        self.log("   继续尝试无cookies访问...")
-                
-                page = await context.new_page()
-                page.set_default_timeout(self.timeout * 1000)
-                
-                self.log(f"正在访问页面: {url}")
-                await page.goto(url, wait_until="domcontentloaded")
-                
-                # 等待页面加载
-                self.log("等待页面加载...")
-                await page.wait_for_timeout(3000)
-                
-                # 检查登录状态
-                is_logged_in = await self.check_login_status(page)
-                if not is_logged_in:
-                    self.log("❌ 未检测到登录状态，可能需要有效的cookies", "WARNING")
-                
-                # 分析页面结构
-                await self.analyze_page_structure(page)
-                
-                # 截图保存当前状态
-                await self.take_screenshot(page, "page_initial.png")
-                
-                # 滚动加载更多评论
-                await self.scroll_and_load_comments(page, max_rounds=max_scrolls)
-                
-                # 截图保存滚动后状态
-                await self.take_screenshot(page, "page_after_scroll.png")
-                
-                # 提取评论数据
-                comments = await self.extract_comments(page)
-                
-                await context.close()
-                await browser.close()
-                
-                return comments
+                        self.log(f"爬取 {url} 时出错: {e}", "ERROR")
+                        return []
+            
+            return list(await asyncio.gather(*(scrape_one(url) for url in urls)))
                 
         except Exception as e:
-            self.log(f"爬取过程中出错: {e}", "ERROR")
-            return []
+            self.log(f"批量爬取过程中出错: {e}", "ERROR")
+            return [[] for _ in urls]
+        finally:
+            if owns_browser:
+                await self.close()
+    
+    def _write_json_file(self, comments, output_file, note_id, url):
+        """保存为JSON格式：逐条写出评论，不再组装一份包含全部评论的结果字典"""
+        _write_comments_json(
+            output_file,
+            (
+                ("note_id", note_id),
+                ("url", url),
+                ("scraped_at", datetime.now().isoformat()),
+                ("comment_count", len(comments)),
+            ),
+            comments,
+            (("scraper_version", "v2.1_with_cookies"),)
+        )
+        self.log(f"成功保存 {len(comments)} 条评论到: {output_file}")
+    
+    def _write_txt_file(self, comments, output_file, note_id, url):
+        """保存一个纯文本版本方便查看：先在内存中拼接完整内容，再一次写入"""
+        txt_file = output_file.replace('.json', '.txt')
+        header = (
+            f"小红书笔记评论 - {note_id}\n"
+            f"URL: {url}\n"
+            f"爬取时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"评论总数: {len(comments)}\n"
+            + "=" * 50 + "\n\n"
+        )
+        separator = "-" * 30
+        body = "".join(
+            f"{i}. {comment.get('username', '匿名用户')}\n"
+            f"   时间: {comment.get('timestamp', '未知')}\n"
+            f"   内容: {comment['content']}\n"
+            f"   点赞: {comment.get('like_count', 0)}\n"
+            f"   元素信息: {comment.get('element_tag', 'unknown')}.{comment.get('element_class', 'none')}\n"
+            f"{separator}\n"
+            for i, comment in enumerate(comments, 1)
+        )
+        with open(txt_file, "w", encoding="utf-8") as f:
+            f.write(header + body)
+        self.log(f"同时保存文本版本到: {txt_file}")
     
-    def save_comments(self, comments, output_file, url):
-        """保存评论数据到文件"""
+    def save_comments(self, comments, output_file, url, write_txt=False):
+        """保存评论数据到文件；write_txt 为 True 时同时保存纯文本版本"""
         note_id = self.extract_note_id(url)
         
-        result_data = {
-            "note_id": note_id,
-            "url": url,
-            "scraped_at": datetime.now().isoformat(),
-            "comment_count": len(comments),
-            "comments": comments,
-            "scraper_version": "v2.1_with_cookies"
-        }
-        
         # 确保输出目录存在
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-        # 保存为JSON格式
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
-        
-        self.log(f"成功保存 {len(comments)} 条评论到: {output_file}")
+        self._write_json_file(comments, output_file, note_id, url)
+        if write_txt:
+            self._write_txt_file(comments, output_file, note_id, url)
+    
+    async def save_comments_async(self, comments, output_file, url, write_txt=False):
+        """save_comments 的异步版本：JSON 和纯文本文件在线程池中并发写入，不阻塞事件循环"""
+        note_id = self.extract_note_id(url)
         
-        # 同时保存一个纯文本版本方便查看
-        txt_file = output_file.replace('.json', '.txt')
-        with open(txt_file, "w", encoding="utf-8") as f:
-            f.write(f"小红书笔记评论 - {note_id}\n")
-            f.write(f"URL: {url}\n")
-            f.write(f"爬取时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"评论总数: {len(comments)}\n")
-            f.write("=" * 50 + "\n\n")
-            
-            for i, comment in enumerate(comments, 1):
-                f.write(f"{i}. {comment.get('username', '匿名用户')}\n")
-                f.write(f"   时间: {comment.get('timestamp', '未知')}\n")
-                f.write(f"   内容: {comment['content']}\n")
-                f.write(f"   点赞: {comment.get('like_count', 0)}\n")
-                f.write(f"   元素信息: {comment.get('element_tag', 'unknown')}.{comment.get('element_class', 'none')}\n")
-                f.write("-" * 30 + "\n")
+        # 确保输出目录存在
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-        self.log(f"同时保存文本版本到: {txt_file}")
+        writes = [asyncio.to_thread(self._write_json_file, comments, output_file, note_id, url)]
+        if write_txt:
+            writes.append(asyncio.to_thread(self._write_txt_file, comments, output_file, note_id, url))
+        await asyncio.gather(*writes)
 
 def main():
     """主函数"""
@@ -689,7 +1103,7 @@ def main():
         
         if comments:
             # 保存结果
-            scraper.save_comments(comments, config["output_file"], config["url"])
+            scraper.save_comments(comments, config["output_file"], config["url"], write_txt=True)
             
             # 打印统计信息
             print("\n📊 爬取统计:")
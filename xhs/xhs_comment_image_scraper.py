@@ -7,16 +7,203 @@ import asyncio
 from urllib.parse import urlparse
 from playwright.async_api import async_playwright
 
+try:
+    # orjson 在 C 层完成序列化和缩进，未安装时退回标准库 json
+    import orjson
+except ImportError:
+    orjson = None
+
+# 预编译正则，避免每次调用时重复查找 re 模块缓存
+_NOTE_ID_RE = re.compile(r"/item/([a-z0-9]+)")
+
+# 滚动后尝试点击的"展开更多评论/查看全部/更多"等按钮文字
+_EXPAND_TEXTS = ("展开更多评论", "查看全部", "更多", "展开", "更多评论")
+
+# 一轮滚动在浏览器内完成：滚动到底部、等待加载、依次点击各按钮文字第一个匹配的可见元素，
+# 返回滚动前后的页面高度，每轮只需一次 evaluate。
+# 等待加载时轮询页面高度，新内容出现后再稍等 settleMs 即继续，sleepMs / clickWaitMs 只是等待上限
+_SCROLL_STEP_JS = r"""
+async ({texts, sleepMs, clickWaitMs, settleMs}) => {
+  const POLL_MS = 100;
+  const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+  // 等待页面高度超过 height，最多等待 timeoutMs
+  const waitForGrowth = async (height, timeoutMs) => {
+    const deadline = performance.now() + timeoutMs;
+    while (performance.now() < deadline) {
+      await sleep(Math.min(POLL_MS, deadline - performance.now()));
+      if (document.body.scrollHeight > height) {
+        await sleep(settleMs);
+        return;
+      }
+    }
+  };
+  // 可见性判断与 Playwright 的 is_visible 一致：包围盒非空且未设置 visibility: hidden
+  const isVisible = (el) => {
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+  };
+
+  const prev = document.body.scrollHeight;
+  window.scrollTo(0, prev);
+  await waitForGrowth(prev, sleepMs);
+
+  // 与 get_by_text(exact=False).first 一样按子串匹配，取文档顺序第一个包含该文字的元素，
+  // 同样跳过 script / style / noscript 中的文本；
+  // 一次 XPath 查询取出包含任一文字的文本节点，同时记下每个文字的第一个匹配
+  const firstMatches = texts.map(() => null);
+  let remaining = texts.length;
+  const result = document.evaluate(
+    '//body//text()[' + texts.map(text => 'contains(., ' + JSON.stringify(text) + ')').join(' or ') + ']' +
+      '[not(ancestor::script or ancestor::style or ancestor::noscript)]',
+    document, null, XPathResult.ORDERED_NODE_ITERATOR_TYPE, null
+  );
+  for (let node = result.iterateNext(); node && remaining > 0; node = result.iterateNext()) {
+    texts.forEach((text, i) => {
+      if (firstMatches[i] === null && node.data.includes(text)) {
+        firstMatches[i] = node;
+        remaining--;
+      }
+    });
+  }
+
+  for (const node of firstMatches) {
+    try {
+      const btn = node && node.parentElement;
+      if (btn && isVisible(btn)) {
+        const height = document.body.scrollHeight;
+        btn.click();
+        await waitForGrowth(height, clickWaitMs);
+      }
+    } catch (e) {}
+  }
+
+  return {prev, next: document.body.scrollHeight};
+}
+"""
+
+# 评论区图片提取脚本：优先从疑似"评论区"容器提取，返回去重后的图片URL列表
+_EXTRACT_JS = r"""
+() => {
+  const urls = new Set();
+  // 小红书图片所在域名特征
+  const IMAGE_HOST_RE = /(xiaohongshu\.com|xhscdn\.com|sns-img|redcdn)/i;
+
+  // 去掉查询串后按域名特征筛选；直接截取字符串，不为每个 URL 创建 split 数组
+  const pickUrl = (u) => {
+    if (!u) return;
+    const q = u.indexOf('?');
+    const clean = q === -1 ? u : u.slice(0, q);
+    if (IMAGE_HOST_RE.test(clean)) {
+      urls.add(clean);
+    }
+  };
+
+  // 背景图只检查可能带图片的元素：内联 background 样式，或类名带封面/头像/图片特征
+  const BG_SELECTOR = '[style*="background"], .cover, .avatar, [class*="img"], [class*="pic"], [class*="bg"]';
+
+  const fromImg = (img) => {
+    const c1 = img.currentSrc || img.src || img.getAttribute('data-src') || "";
+    if (c1) pickUrl(c1);
+    const srcset = img.srcset || img.getAttribute('srcset');
+    if (srcset) {
+      const first = srcset.split(',')[0].trim().split(' ')[0];
+      pickUrl(first);
+    }
+  };
+
+  const fromBg = (el) => {
+    // 先读内联样式，为空时才计算样式
+    const bg = el.style.backgroundImage || getComputedStyle(el).backgroundImage;
+    if (bg && bg.startsWith('url(')) {
+      const m = bg.match(/url\(["']?(.*?)["']?\)/);
+      if (m && m[1]) pickUrl(m[1]);
+    }
+  };
+
+  // 每个范围只查询一次 DOM；同一范围内背景图排在 img 之后，与分开遍历时的顺序一致
+  const fromScope = (root) => {
+    const bgEls = [];
+    root.querySelectorAll('img, ' + BG_SELECTOR).forEach(el => {
+      if (el.tagName === 'IMG') {
+        fromImg(el);
+        if (!el.matches(BG_SELECTOR)) return;
+      }
+      bgEls.push(el);
+    });
+    bgEls.forEach(fromBg);
+  };
+
+  // 先按 aria-label / id / class 中的评论标识筛选容器，由 CSS 引擎完成匹配
+  const CONTAINER_TAGS = 'section,div,main,article,aside';
+  const LABELED_CONTAINER_SELECTOR = ':is(' + CONTAINER_TAGS + '):is(' +
+    '[aria-label*="comment" i],[id*="comment" i],[class*="comment" i],' +
+    '[aria-label*="评论"],[id*="评论"],[class*="评论"])';
+  const COMMENT_TEXT_RE = /评论|comment/i;
+
+  let candidates = Array.from(document.querySelectorAll(LABELED_CONTAINER_SELECTOR));
+  if (!candidates.length) {
+    // 没有带评论标识的容器时，再按开头 200 个字符的文本查找
+    candidates = Array.from(document.querySelectorAll(CONTAINER_TAGS))
+      .filter(n => COMMENT_TEXT_RE.test((n.textContent||'').slice(0, 200)));
+  }
+
+  // 如果找不到特定容器，退化为全局扫描
+  const scopes = candidates.length ? candidates : [document];
+
+  scopes.forEach(fromScope);
+
+  return Array.from(urls);
+}
+"""
+
+# 每个浏览器上下文注册一次，页面中通过 window.__xhsExtractImages() 调用，
+# 不必每次 evaluate 都把整段脚本传给浏览器重新解析
+_INIT_JS = f"""
+window.__xhsExtractImages = {_EXTRACT_JS};
+"""
+
+# 浏览器上下文参数，所有上下文共用
+_CONTEXT_ARGS = dict(
+    user_agent=("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/124.0.0.0 Safari/537.36"),
+    viewport={'width': 1280, 'height': 900},
+    locale='zh-CN',
+)
+
+# 拦截的资源类型：图片URL取自 DOM 属性和样式，不需要下载图片本身；
+# 样式表保留，类名上的背景图和元素可见性判断都依赖样式
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+async def _block_media_route(route):
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+def _encode_json(data) -> bytes:
+    # 以 2 空格缩进编码为 UTF-8 JSON 字节，一次写入文件；安装了 orjson 时使用 orjson
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+def _read_json(path: str):
+    # 读取 JSON 文件；安装了 orjson 时直接解析文件字节，由 orjson 在 C 层完成 UTF-8 解码
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 def extract_note_id(url: str) -> str | None:
-    m = re.search(r"/item/([a-z0-9]+)", url)
+    m = _NOTE_ID_RE.search(url)
     return m.group(1) if m else None
 
 def load_cookies(cookie_path: str | None):
     if not cookie_path:
         return None
     try:
-        with open(cookie_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = _read_json(cookie_path)
         # 兼容常见导出格式：直接数组或 {cookies: []}
         if isinstance(data, dict) and "cookies" in data:
             return data["cookies"]
@@ -29,21 +216,23 @@ async def scroll_and_expand(page, max_rounds: int = 20, sleep_sec: float = 1.0):
     last_height = 0
     stable_rounds = 0
     for i in range(max_rounds):
-        curr_height = await page.evaluate("document.body.scrollHeight")
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await page.wait_for_timeout(int(sleep_sec * 1000))
-
-        # 尝试点击"展开更多评论/查看全部/更多"等按钮
-        for txt in ["展开更多评论", "查看全部", "更多", "展开", "更多评论"]:
+        # 滚动、等待并尝试点击"展开更多评论/查看全部/更多"等按钮
+        try:
+            heights = await page.evaluate(_SCROLL_STEP_JS, {
+                "texts": _EXPAND_TEXTS,
+                "sleepMs": int(sleep_sec * 1000),
+                "clickWaitMs": 500,
+                "settleMs": 150,
+            })
+        except Exception as e:
+            # 点中的按钮是链接时页面会跳转，本轮脚本随之中断；等新页面加载后继续下一轮
+            print(f"第 {i + 1} 轮滚动中断: {e}")
             try:
-                btn = page.get_by_text(txt, exact=False).first
-                if await btn.is_visible():
-                    await btn.click(timeout=1000)
-                    await page.wait_for_timeout(500)
-            except:
-                pass
-
-        new_height = await page.evaluate("document.body.scrollHeight")
+                await page.wait_for_load_state("domcontentloaded")
+            except Exception:
+                break
+            continue
+        curr_height, new_height = heights["prev"], heights["next"]
         if new_height == curr_height == last_height:
             stable_rounds += 1
             if stable_rounds >= 2:
@@ -53,126 +242,134 @@ async def scroll_and_expand(page, max_rounds: int = 20, sleep_sec: float = 1.0):
             last_height = new_height
 
 async def extract_comment_images(page):
-    # 优先从疑似"评论区"容器提取
-    js = r"""
-(() => {
-  const urls = new Set();
+    # 调用已通过 _INIT_JS 注册到页面的提取脚本；页面未注册时直接执行完整脚本
+    try:
+        # 页面脚本用 Set 收集，返回的列表已去重且保持插入顺序
+        urls = await page.evaluate("window.__xhsExtractImages ? window.__xhsExtractImages() : null")
+        if urls is None:
+            urls = await page.evaluate(_EXTRACT_JS)
+        return urls
+    except Exception as e:
+        print(f"提取图片URL时出错: {e}")
+        return []
 
-  const pickUrl = (u) => {
-    if (!u) return;
-    try {
-      const clean = u.split('?')[0];
-      if (/(xiaohongshu\.com|xhscdn\.com|sns-img|redcdn)/i.test(clean)) {
-        urls.add(clean);
-      }
-    } catch (e) {}
-  };
+class ContextPool:
+    # 预先创建 size 个浏览器上下文，UA/视口、cookies、提取脚本和请求拦截在每个上下文中只设置一次；
+    # 抓取时借出一个上下文、用完归还，多个URL轮流复用
+    def __init__(self, browser, size: int, cookies=None, block_media: bool = True):
+        self._browser = browser
+        self._size = size
+        self._cookies = cookies
+        self._block_media = block_media
+        self._contexts = []
+        self._queue = asyncio.Queue()
 
-  const fromImg = (root) => {
-    const imgs = root.querySelectorAll('img');
-    imgs.forEach(img => {
-      const c1 = img.currentSrc || img.src || img.getAttribute('data-src') || "";
-      if (c1) pickUrl(c1);
-      const srcset = img.srcset || img.getAttribute('srcset');
-      if (srcset) {
-        const first = srcset.split(',')[0].trim().split(' ')[0];
-        pickUrl(first);
-      }
-    });
-  };
+    async def _new_context(self):
+        context = await self._browser.new_context(**_CONTEXT_ARGS)
+        self._contexts.append(context)
+        # 注册图片提取脚本，该上下文中的所有页面共用
+        await context.add_init_script(_INIT_JS)
+        if self._block_media:
+            await context.route("**/*", _block_media_route)
+        if self._cookies:
+            try:
+                await context.add_cookies(self._cookies)
+                print("已导入cookies")
+            except Exception as e:
+                print(f"导入cookies失败: {e}")
+        return context
 
-  const fromBg = (root) => {
-    const all = root.querySelectorAll('*');
-    all.forEach(el => {
-      const bg = getComputedStyle(el).backgroundImage;
-      if (bg && bg.startsWith('url(')) {
-        const m = bg.match(/url\(["']?(.*?)["']?\)/);
-        if (m && m[1]) pickUrl(m[1]);
-      }
-    });
-  };
+    async def open(self):
+        contexts = await asyncio.gather(*(self._new_context() for _ in range(self._size)))
+        for context in contexts:
+            self._queue.put_nowait(context)
 
-  const candidates = [];
-  const nodes = Array.from(document.querySelectorAll('section,div,main,article,aside'));
-  nodes.forEach(n => {
-    const label = (
-      (n.getAttribute('aria-label')||'') + ' ' +
-      (n.id||'') + ' ' +
-      (n.className||'')
-    ).toLowerCase();
-    const text = (n.textContent||'').slice(0, 200).toLowerCase();
-    if (
-      label.includes('comment') || label.includes('评论') ||
-      text.includes('评论') || text.includes('comment')
-    ) {
-      candidates.push(n);
-    }
-  });
+    async def acquire(self):
+        return await self._queue.get()
 
-  // 如果找不到特定容器，退化为全局扫描
-  const scopes = candidates.length ? candidates : [document];
+    def release(self, context):
+        self._queue.put_nowait(context)
 
-  scopes.forEach(root => { fromImg(root); fromBg(root); });
+    async def close(self):
+        for context in self._contexts:
+            await context.close()
+        self._contexts.clear()
 
-  return Array.from(urls);
-})();
-"""
+    async def __aenter__(self):
+        try:
+            await self.open()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+async def scrape_page(context, url: str, timeout: int = 25, max_scrolls: int = 20):
+    page = await context.new_page()
     try:
-        urls = await page.evaluate(js)
-        return list(dict.fromkeys(urls))  # 去重保序
-    except Exception as e:
-        print(f"提取图片URL时出错: {e}")
-        return []
+        page.set_default_timeout(timeout * 1000)
 
-async def scrape(url: str, cookies_path: str | None = None, headless: bool = True,
-                 timeout: int = 25, max_scrolls: int = 20):
+        print(f"正在访问页面: {url}")
+        # 评论由 XHR 加载，不必等待 load 事件
+        await page.goto(url, wait_until="domcontentloaded")
+        # 等待首屏主要内容
+        try:
+            await page.wait_for_timeout(1500)
+        except:
+            pass
+
+        print("正在滚动加载评论...")
+        # 滚动加载评论，并尽可能展开更多
+        await scroll_and_expand(page, max_rounds=max_scrolls, sleep_sec=1.0)
+
+        print("正在提取图片...")
+        # 抽取评论区图片
+        return await extract_comment_images(page)
+    finally:
+        # 上下文会被后续URL复用，页面用完即关闭
+        await page.close()
+
+async def scrape_many(urls: list[str], cookies_path: str | None = None, headless: bool = True,
+                      timeout: int = 25, max_scrolls: int = 20, concurrency: int = 8,
+                      block_media: bool = True):
+    # 只启动一次浏览器，从 ContextPool 借用上下文，同时抓取的数量不超过 concurrency；
+    # 返回与 urls 一一对应的图片URL列表，抓取失败的URL对应空列表；
+    # block_media 为 True 时在网络层丢弃图片、视频和字体请求
+    if not urls:
+        return []
     try:
         async with async_playwright() as p:
             print("正在启动浏览器...")
             browser = await p.chromium.launch(headless=headless)
-            context_args = dict(
-                user_agent=("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                            "AppleWebKit/537.36 (KHTML, like Gecko) "
-                            "Chrome/124.0.0.0 Safari/537.36"),
-                viewport={'width': 1280, 'height': 900},
-                locale='zh-CN',
-            )
-            context = await browser.new_context(**context_args)
-
-            # 导入登录态（可选）
-            cookies = load_cookies(cookies_path)
-            if cookies:
-                try:
-                    await context.add_cookies(cookies)
-                    print("已导入cookies")
-                except Exception as e:
-                    print(f"导入cookies失败: {e}")
-
-            page = await context.new_page()
-            page.set_default_timeout(timeout * 1000)
-
-            print("正在访问页面...")
-            await page.goto(url, wait_until="load")
-            # 等待首屏主要内容
             try:
-                await page.wait_for_timeout(1500)
-            except:
-                pass
-
-            print("正在滚动加载评论...")
-            # 滚动加载评论，并尽可能展开更多
-            await scroll_and_expand(page, max_rounds=max_scrolls, sleep_sec=1.0)
-
-            print("正在提取图片...")
-            # 抽取评论区图片
-            imgs = await extract_comment_images(page)
+                # 导入登录态（可选），cookies文件只解析一次，所有上下文共用
+                cookies = load_cookies(cookies_path)
+                pool_size = min(concurrency, len(urls))
+                async with ContextPool(browser, pool_size, cookies=cookies, block_media=block_media) as pool:
+                    async def scrape_one(url: str):
+                        context = await pool.acquire()
+                        try:
+                            return await scrape_page(context, url, timeout=timeout, max_scrolls=max_scrolls)
+                        except Exception as e:
+                            print(f"抓取过程中出错: {url}: {e}")
+                            return []
+                        finally:
+                            pool.release(context)
 
-            await context.close()
-            await browser.close()
-            return imgs
+                    return await asyncio.gather(*(scrape_one(url) for url in urls))
+            finally:
+                await browser.close()
     except Exception as e:
         print(f"抓取过程中出错: {e}")
-        return []
+        return [[] for _ in urls]
+
+async def scrape(url: str, cookies_path: str | None = None, headless: bool = True,
+                 timeout: int = 25, max_scrolls: int = 20, block_media: bool = True):
+    results = await scrape_many([url], cookies_path=cookies_path, headless=headless,
+                                timeout=timeout, max_scrolls=max_scrolls, block_media=block_media)
+    return results[0]
 
 def main():
     # 硬编码配置参数
@@ -222,15 +419,17 @@ def main():
                     "image_count": len(imgs),
                     "images": imgs
                 }
-                with open(output_path, "w", encoding="utf-8") as f:
-                    json.dump(result_data, f, ensure_ascii=False, indent=2)
+                with open(output_path, "wb") as f:
+                    f.write(_encode_json(result_data))
             else:
-                # 保存为文本格式
+                # 保存为文本格式，拼接完整内容后一次写入
                 with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(f"# Token: {config['token']}\n")
-                    f.write(f"# URL: {config['url']}\n")
-                    f.write(f"# Image Count: {len(imgs)}\n\n")
-                    f.write("\n".join(imgs))
+                    f.write(
+                        f"# Token: {config['token']}\n"
+                        f"# URL: {config['url']}\n"
+                        f"# Image Count: {len(imgs)}\n\n"
+                        + "\n".join(imgs)
+                    )
             
             print(f"✅ 成功保存 {len(imgs)} 条图片URL -> {output_path}")
         else:
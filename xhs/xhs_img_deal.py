@@ -4,16 +4,20 @@ from urllib.parse import urlsplit, urlunsplit, quote
 import sys
 
 
+# quote(safe='') 不会改动的字符组成的文件名（如小红书图片基名 + .png/.jpg）无需再编码
+_SAFE_NAME_RE = re.compile(r'[A-Za-z0-9._~-]+')
+
+
 def _derive_basename_from_path(path: str) -> str:
     """
     从 URL 路径最后一段中提取基名：
     - 优先取 '!' 之前的部分作为基名
     - 若不存在 '!'，使用整段文件名
     """
-    last = path.rsplit('/', 1)[-1]
-    if '!' in last:
-        return last.split('!', 1)[0]
-    return last
+    # 按下标截取，不为 rsplit / split 创建临时列表
+    last = path[path.rfind('/') + 1:]
+    i = last.find('!')
+    return last if i < 0 else last[:i]
 
 
 def _normalize_fmt(fmt: str) -> str:
@@ -26,43 +30,55 @@ def _normalize_fmt(fmt: str) -> str:
     return fmt
 
 
-def _set_format_in_query(query: str, fmt: str) -> str:
+def _set_format_in_segment(seg: str, fmt: str) -> str:
     """
-    在原有查询串中，确保存在 imageMogr2，并将/追加到 format/{fmt}。
-    不使用 urlencode，避免把 'imageMogr2/...' 结构转义为 key=value。
+    将 imageMogr2 段中的 format/ 替换为 format/{fmt}，没有时追加到末尾。
+    format/ 的取值到下一个 '/'、'&' 或 '?' 为止，直接按下标扫描，不经过正则。
     """
-    parts = [p for p in query.split('&') if p] if query else []
+    i = seg.find('/format/')
+    if i < 0:
+        return seg.rstrip('/') + f'/format/{fmt}'
+    start = i + len('/format/')
+    end = start
+    while end < len(seg) and seg[end] not in '/&?':
+        end += 1
+    return seg[:start] + fmt + seg[end:]
 
-    # 找 imageMogr2 段（它不是 key=value，而是单一段 'imageMogr2/...'）
-    idx = next((i for i, p in enumerate(parts) if p.startswith('imageMogr2')), None)
-    if idx is None:
-        parts.append(f'imageMogr2/format/{fmt}')
-    else:
-        seg = parts[idx]
-        if '/format/' in seg:
-            seg = re.sub(r'/format/[^/&?]*', f'/format/{fmt}', seg, count=1)
-        else:
-            seg = seg.rstrip('/') + f'/format/{fmt}'
-        parts[idx] = seg
 
-    return '&'.join(parts)
-
-
-def _set_attname_in_query(query: str, filename: str) -> str:
+def _parse_query(query: str) -> tuple[list[str], int | None, int | None]:
     """
-    在查询串中设置/替换 attname=，并对文件名进行 URL 编码。
+    切分查询串，返回 (各段列表, 第一个 imageMogr2 段下标, 第一个 attname= 段下标)，不存在时下标为 None。
+    imageMogr2 段不是 key=value，而是单一段 'imageMogr2/...'。
     """
     parts = [p for p in query.split('&') if p] if query else []
-    encoded = 'attname=' + quote(filename, safe='')
-
-    replaced = False
+    mogr_idx = None
+    attname_idx = None
     for i, p in enumerate(parts):
-        if p.startswith('attname='):
-            parts[i] = encoded
-            replaced = True
+        if mogr_idx is None and p.startswith('imageMogr2'):
+            mogr_idx = i
+        elif attname_idx is None and p.startswith('attname='):
+            attname_idx = i
+        if mogr_idx is not None and attname_idx is not None:
             break
-    if not replaced:
+    return parts, mogr_idx, attname_idx
+
+
+def _build_query(parts: list[str], mogr_idx: int | None, attname_idx: int | None,
+                 fmt: str, filename: str) -> str:
+    """
+    基于 _parse_query 的结果设置 format/{fmt} 和 attname=（文件名做 URL 编码），不修改传入的列表。
+    不使用 urlencode，避免把 'imageMogr2/...' 结构转义为 key=value。
+    """
+    parts = parts.copy()
+    encoded = 'attname=' + (filename if _SAFE_NAME_RE.fullmatch(filename) else quote(filename, safe=''))
+    if mogr_idx is None:
+        parts.append(f'imageMogr2/format/{fmt}')
+    else:
+        parts[mogr_idx] = _set_format_in_segment(parts[mogr_idx], fmt)
+    if attname_idx is None:
         parts.append(encoded)
+    else:
+        parts[attname_idx] = encoded
     return '&'.join(parts)
 
 
@@ -80,11 +96,25 @@ def convert_url(url: str, fmt: str, filename: str | None = None) -> str:
     base = _derive_basename_from_path(sp.path)
     expect_name = f"{base}.{fmt}" if not filename else filename
 
-    # 处理查询串：设置/替换 format，再设置/替换 attname
-    q1 = _set_format_in_query(sp.query, fmt)
-    q2 = _set_attname_in_query(q1, expect_name)
+    # 处理查询串：设置/替换 format 和 attname
+    query = _build_query(*_parse_query(sp.query), fmt, expect_name)
+
+    return urlunsplit((sp.scheme, sp.netloc, sp.path, query, sp.fragment))
+
+
+def convert_url_both(url: str, filename: str | None = None) -> tuple[str, str]:
+    """
+    同时返回 PNG 和 JPG 两种格式的 URL，结果与分别调用 to_png、to_jpg 相同。
+    URL 拆分、基名提取和查询串切分只做一次，两种格式共用。
+    """
+    sp = urlsplit(url)
+    base = _derive_basename_from_path(sp.path)
+    parsed = _parse_query(sp.query)
 
-    return urlunsplit((sp.scheme, sp.netloc, sp.path, q2, sp.fragment))
+    png_query = _build_query(*parsed, 'png', filename or f"{base}.png")
+    jpg_query = _build_query(*parsed, 'jpg', filename or f"{base}.jpg")
+    return (urlunsplit((sp.scheme, sp.netloc, sp.path, png_query, sp.fragment)),
+            urlunsplit((sp.scheme, sp.netloc, sp.path, jpg_query, sp.fragment)))
 
 
 def to_png(url: str, filename: str | None = None) -> str:
@@ -97,8 +127,9 @@ def to_jpg(url: str, filename: str | None = None) -> str:
 
 def _demo():
     origin = "https://sns-webpic-qc.xhscdn.com/202508081203/37ef76c1b643207bc131f3c54d95b607/notes_pre_post/1040g3k031kssdadd30005oujaj4ptcu7pvcpuh0!nd_dft_wlteh_jpg_3"
-    print("PNG:", to_png(origin))
-    print("JPG:", to_jpg(origin))
+    png_url, jpg_url = convert_url_both(origin)
+    print("PNG:", png_url)
+    print("JPG:", jpg_url)
     # 验证 Content-Type（示例，实际可使用 curl 或 requests 验证）
 
 